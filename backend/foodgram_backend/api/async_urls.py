@@ -0,0 +1,26 @@
+from django.urls import path
+
+from . import async_views
+
+urlpatterns = [
+    path('recipes/', async_views.recipe_list, name='async-recipes'),
+    path(
+        'recipes/download_shopping_cart/',
+        async_views.download_shopping_cart,
+        name='async-download-shopping-cart'
+    ),
+    path(
+        'recipes/<int:pk>/',
+        async_views.recipe_detail,
+        name='async-recipe-detail'
+    ),
+    path(
+        'ingredients/', async_views.ingredient_list,
+        name='async-ingredients'
+    ),
+    path(
+        'short/<slug:short_link>/',
+        async_views.get_recipe_by_short_link,
+        name='async-short-link'
+    ),
+]
@@ -0,0 +1,196 @@
+"""Асинхронные варианты основных эндпоинтов чтения.
+
+Под ASGI (uvicorn) запросы обслуживаются в цикле событий и не занимают
+поток на все время обработки. Ответы совпадают с ответами синхронных
+RecipeViewSet и IngridientViewSet.
+"""
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import AnonymousUser
+from django.core.paginator import InvalidPage
+from django.db.models import F, Prefetch
+from django.http import (
+    HttpResponse,
+    HttpResponseRedirect,
+    StreamingHttpResponse,
+)
+from rest_framework import exceptions
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+
+from recipes.ingredient_index import ingredient_index
+from recipes.models import Ingredient, Recipe, RecipeIngredient
+
+from .authentication import CachedTokenAuthentication
+from .cache import short_links
+from .filters import IngredientFilter, RecipeFilter
+from .pagination import CustomPagination
+from .relations import UserRelations
+from .serializers import IngredientSerializer, ReadRecipeSerializer
+from .shopping_list import FORMATS, astream_shopping_list
+
+authentication = CachedTokenAuthentication()
+
+
+def async_api_view(view):
+    """Аутентификация по токену и ответы об ошибках в формате DRF."""
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if request.method != 'GET':
+            return render_error(exceptions.MethodNotAllowed(request.method))
+
+        try:
+            result = await authentication.aauthenticate(request)
+            request.user = result[0] if result else AnonymousUser()
+            return await view(request, *args, **kwargs)
+        except exceptions.APIException as error:
+            return render_error(error)
+
+    return wrapper
+
+
+def render(data, status=200):
+    return HttpResponse(
+        JSONRenderer().render(data),
+        content_type='application/json',
+        status=status,
+    )
+
+
+def render_error(error):
+    data = error.detail
+
+    if not isinstance(data, (list, dict)):
+        data = {'detail': data}
+
+    response = render(data, error.status_code)
+
+    if isinstance(error, exceptions.NotAuthenticated):
+        response['WWW-Authenticate'] = authentication.authenticate_header(
+            None
+        )
+
+    return response
+
+
+def get_recipes_queryset():
+    return Recipe.objects.select_related('author').prefetch_related(
+        Prefetch(
+            'recipe_ingredients',
+            queryset=RecipeIngredient.objects.select_related(
+                'ingredient'
+            ).order_by('ingredient__name')
+        )
+    )
+
+
+async def serialize_recipes(request, recipes, many):
+    """Флаги связей загружаются заранее, поэтому сериализация
+    выполняется без запросов к базе.
+    """
+    relations = UserRelations(request.user)
+    await relations.aload_recipes(recipes if many else (recipes,))
+
+    return ReadRecipeSerializer(recipes, many=many, context={
+        'request': Request(request),
+        'user_relations': relations,
+    }).data
+
+
+@async_api_view
+async def recipe_list(request):
+    filterset = RecipeFilter(
+        request.GET, get_recipes_queryset(), request=request
+    )
+
+    if not filterset.is_valid():
+        raise exceptions.ValidationError(filterset.errors)
+
+    pagination = CustomPagination()
+    pagination.request = Request(request)
+    pagination.cursor_ordering = None
+    paginator = pagination.django_paginator_class(
+        filterset.qs, pagination.get_page_size(pagination.request)
+    )
+
+    try:
+        # Число записей берется из кеша, поэтому вызов синхронный.
+        pagination.page = await sync_to_async(paginator.page)(
+            request.GET.get(pagination.page_query_param, 1)
+        )
+    except InvalidPage:
+        raise exceptions.NotFound('Неверная страница.')
+
+    recipes = [recipe async for recipe in pagination.page.object_list]
+    data = await serialize_recipes(request, recipes, many=True)
+
+    return render(pagination.get_paginated_response(data).data)
+
+
+@async_api_view
+async def recipe_detail(request, pk):
+    try:
+        recipe = await get_recipes_queryset().aget(pk=pk)
+    except Recipe.DoesNotExist:
+        raise exceptions.NotFound()
+
+    return render(await serialize_recipes(request, recipe, many=False))
+
+
+@async_api_view
+async def ingredient_list(request):
+    name = request.GET.get('name')
+
+    if name is not None:
+        # Индекс в памяти отвечает без базы, кроме редких перестроений.
+        ingredients = await sync_to_async(ingredient_index.search)(name)
+    else:
+        ingredients = [
+            ingredient async for ingredient in IngredientFilter(
+                request.GET, Ingredient.objects.all(), request=request
+            ).qs
+        ]
+
+    return render(IngredientSerializer(ingredients, many=True).data)
+
+
+@async_api_view
+async def download_shopping_cart(request):
+    if not request.user.is_authenticated:
+        raise exceptions.NotAuthenticated()
+
+    file_format = request.GET.get('format', 'txt')
+
+    if file_format not in FORMATS:
+        raise exceptions.NotFound()
+
+    ingredients = request.user.shopping_cart_totals.values(
+        'ingredient__name',
+        'ingredient__measurement_unit',
+        total_amount=F('amount')
+    ).order_by('ingredient__name')
+    content, content_type = astream_shopping_list(ingredients, file_format)
+
+    response = StreamingHttpResponse(content, content_type=content_type)
+    response['Content-Disposition'] = (
+        f'attachment; filename="shopping_list.{file_format}"'
+    )
+
+    return response
+
+
+async def get_recipe_by_short_link(request, short_link):
+    recipe_id = short_links.get(short_link)
+
+    if recipe_id is None:
+        recipe_id = await Recipe.objects.filter(
+            short_link=short_link
+        ).values_list('id', flat=True).afirst()
+
+        if recipe_id is None:
+            return render({'detail': 'Страница не найдена.'}, 404)
+
+        short_links.set(short_link, recipe_id)
+
+    return HttpResponseRedirect(f'/recipes/{recipe_id}')
@@ -0,0 +1,128 @@
+import copy
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import (
+    TokenAuthentication,
+    get_authorization_header,
+)
+
+from .cache import LRUCache
+
+AUTH_VERSION_KEY = 'token_version:{}'
+
+
+def get_version_key(token_key):
+    # В общем кеше (Redis, файлы) хранится хеш, а не сам токен.
+    return AUTH_VERSION_KEY.format(
+        hashlib.sha256(token_key.encode()).hexdigest()
+    )
+
+
+def get_token_version(token_key):
+    key = get_version_key(token_key)
+    version = cache.get(key)
+
+    if version is None:
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+
+    return version
+
+
+async def aget_token_version(token_key):
+    key = get_version_key(token_key)
+    version = await cache.aget(key)
+
+    if version is None:
+        await cache.aadd(key, time.time_ns(), None)
+        version = await cache.aget(key)
+
+    return version
+
+
+def invalidate_token(token_key):
+    """Сброс токена в кешах всех процессов, разделяющих кеш Django."""
+    cache.set(get_version_key(token_key), time.time_ns(), None)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """Аутентификация по токену с кешем в памяти процесса.
+
+    Пользователь и токен хранятся не дольше AUTH_TOKEN_CACHE_TTL секунд
+    (0 - кеш выключен) вместе с версией токена из кеша Django. Версия
+    меняется при удалении токена (выход) и при сохранении или удалении
+    пользователя (смена пароля, деактивация), см. api.signals. Проверка
+    версии обходится без запроса к базе; другие процессы видят смену
+    версии, только если кеш Django общий.
+    """
+
+    tokens = LRUCache(
+        settings.AUTH_TOKEN_CACHE_SIZE, ttl=settings.AUTH_TOKEN_CACHE_TTL
+    )
+
+    def authenticate_credentials(self, key):
+        if not settings.AUTH_TOKEN_CACHE_TTL:
+            return super().authenticate_credentials(key)
+
+        # Версия читается до запроса к базе: если токен сбросят
+        # параллельно, запись окажется устаревшей и будет перечитана.
+        version = get_token_version(key)
+        entry = self.tokens.get(key)
+
+        if entry is None or entry[0] != version:
+            user, token = super().authenticate_credentials(key)
+            entry = (version, user, token)
+            self.tokens.set(key, entry)
+
+        return self.copy_entry(entry)
+
+    async def aauthenticate(self, request):
+        """Асинхронный вариант authenticate для async-представлений."""
+        auth = get_authorization_header(request).split()
+
+        if not auth or auth[0].lower() != self.keyword.lower().encode():
+            return None
+
+        if len(auth) != 2:
+            raise exceptions.AuthenticationFailed(_('Invalid token header.'))
+
+        try:
+            key = auth[1].decode()
+        except UnicodeError:
+            raise exceptions.AuthenticationFailed(_('Invalid token header.'))
+
+        version = (
+            await aget_token_version(key)
+            if settings.AUTH_TOKEN_CACHE_TTL else None
+        )
+        entry = self.tokens.get(key)
+
+        if entry is None or entry[0] != version:
+            try:
+                token = await self.get_model().objects.select_related(
+                    'user'
+                ).aget(key=key)
+            except self.get_model().DoesNotExist:
+                raise exceptions.AuthenticationFailed(_('Invalid token.'))
+
+            if not token.user.is_active:
+                raise exceptions.AuthenticationFailed(
+                    _('User inactive or deleted.')
+                )
+
+            entry = (version, token.user, token)
+            if settings.AUTH_TOKEN_CACHE_TTL:
+                self.tokens.set(key, entry)
+
+        return self.copy_entry(entry)
+
+    def copy_entry(self, entry):
+        # Копии, чтобы изменения в одном запросе не попали в другие
+        # потоки через общий кеш.
+        _, user, token = entry
+        return copy.copy(user), copy.copy(token)
@@ -0,0 +1,130 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+VERSION_KEY = 'table_version:{}'
+
+
+def get_table_versions(tables):
+    """Версии таблиц: метки времени последних изменений.
+
+    Версия отсутствующей в кеше таблицы создается заново, а не считается
+    нулевой, чтобы после вытеснения ключа не вернуться к старым данным.
+    """
+    keys = {table: VERSION_KEY.format(table) for table in sorted(tables)}
+    versions = cache.get_many(keys.values())
+
+    for key in keys.values():
+        if key not in versions:
+            cache.add(key, time.time_ns(), None)
+            versions[key] = cache.get(key)
+
+    return {table: versions[key] for table, key in keys.items()}
+
+
+class PendingVersions:
+    """Таблицы, измененные в транзакции; после фиксации их версии
+    меняются еще раз.
+    """
+
+    def __init__(self):
+        self.tables = set()
+
+    def __call__(self):
+        now = time.time_ns()
+        cache.set_many(
+            {VERSION_KEY.format(table): now for table in self.tables}, None
+        )
+
+
+def bump_table_version(table, using=DEFAULT_DB_ALIAS):
+    """Смена версии таблицы сейчас и, внутри транзакции, еще раз после
+    ее фиксации.
+
+    Между первой сменой и фиксацией параллельный запрос еще видит
+    старые строки и может закешировать их под новой версией; повторная
+    смена делает такую запись недоступной. В одном блоке atomic версия
+    таблицы меняется один раз, сколько бы строк ни изменилось.
+    """
+    connection = connections[using]
+
+    if connection.in_atomic_block:
+        # Обработчик привязан к точкам сохранения блока и исчезает
+        # из run_on_commit при его откате, поэтому вложенный блок или
+        # следующая транзакция заводят новый.
+        # Блоки atomic(savepoint=False) добавляют в savepoint_ids None.
+        savepoints = set(connection.savepoint_ids) - {None}
+        pending = next((
+            func for savepoint_ids, func, *_ in connection.run_on_commit
+            if savepoint_ids - {None} == savepoints
+            and isinstance(func, PendingVersions)
+        ), None)
+
+        if pending is None:
+            pending = PendingVersions()
+            transaction.on_commit(pending, using=using)
+        elif table in pending.tables:
+            return
+
+        pending.tables.add(table)
+
+    cache.set(VERSION_KEY.format(table), time.time_ns(), None)
+
+
+def make_key(prefix, *parts):
+    digest = hashlib.md5(repr(parts).encode()).hexdigest()
+    return f'{prefix}:{digest}'
+
+
+class LRUCache:
+    """Ограниченный по размеру кеш в памяти процесса.
+
+    При переполнении вытесняется запись, к которой дольше всего
+    не обращались. Если задан ttl, запись живет не дольше ttl секунд.
+    """
+
+    def __init__(self, maxsize, ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._data:
+                return default
+            expires_at, value = self._data[key]
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        expires_at = (
+            None if self.ttl is None else time.monotonic() + self.ttl
+        )
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+# Код короткой ссылки -> id рецепта.
+short_links = LRUCache(
+    settings.SHORT_LINK_CACHE_SIZE, ttl=settings.SHORT_LINK_CACHE_TTL
+)
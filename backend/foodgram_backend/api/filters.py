@@ -1,19 +1,40 @@
+from django.db.models import Case, IntegerField, Value, When
 from django_filters import rest_framework as filters
 from recipes.models import Ingredient, Recipe
+from recipes.search import search_recipes
 
 
 class IngredientFilter(filters.FilterSet):
-    """Фильтрация ингридиентов по названию или началу названия."""
-    name = filters.CharFilter(lookup_expr='istartswith')
+    """Фильтрация ингридиентов по вхождению строки в название.
+
+    Совпадения по началу названия идут первыми, как в индексе в памяти
+    (recipes.ingredient_index), который заменяет фильтр при
+    INGREDIENT_INDEX_ENABLED. На PostgreSQL поиск идет по триграммному
+    индексу.
+    """
+    name = filters.CharFilter(method='filter_name')
 
     class Meta:
         model = Ingredient
         fields = ('name',)
 
+    def filter_name(self, queryset, name, value):
+        return queryset.filter(name__icontains=value).annotate(
+            prefix_rank=Case(
+                When(name__istartswith=value, then=Value(0)),
+                default=Value(1),
+                output_field=IntegerField(),
+            )
+        ).order_by('prefix_rank', 'name')
+
 
 class RecipeFilter(filters.FilterSet):
     """Фильрация рецептов по id автора, добавлению в избранное 
     и список покупок.
+
+    Параметр search - полнотекстовый поиск по названию и описанию
+    (recipes.search); найденные рецепты упорядочены по релевантности.
+    В режиме курсора порядок задает пагинация, а не релевантность.
     """
 
     author = filters.NumberFilter(field_name='author__id')
@@ -21,10 +42,11 @@ class RecipeFilter(filters.FilterSet):
     is_in_shopping_cart = filters.NumberFilter(
         method='filter_is_in_shopping_cart'
     )
+    search = filters.CharFilter(method='filter_search')
 
     class Meta:
         model = Recipe
-        fields = ('author', 'is_favorited', 'is_in_shopping_cart')
+        fields = ('author', 'is_favorited', 'is_in_shopping_cart', 'search')
 
     def filter_is_favorited(self, queryset, name, value):
         if value and self.request.user.is_authenticated:
@@ -37,3 +59,8 @@ class RecipeFilter(filters.FilterSet):
                 added_in_shopping_cart_by__user=self.request.user
             )
         return queryset
+
+    def filter_search(self, queryset, name, value):
+        return search_recipes(queryset, value).order_by(
+            '-search_rank', *Recipe._meta.ordering, 'id'
+        )
@@ -0,0 +1,266 @@
+import json
+import random
+import statistics
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections, connection, reset_queries
+from django.db.backends.signals import connection_created
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+
+from recipes.models import (
+    Favorite,
+    Ingredient,
+    Recipe,
+    RecipeIngredient,
+    ShoppingCart,
+)
+from users.models import Subscription
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        'Замер задержки, числа запросов и пикового потребления памяти '
+        'основных эндпоинтов API. Результат выводится в формате JSON.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--seed', action='store_true',
+            help=(
+                'Заполнить пустую базу воспроизводимым набором данных '
+                '(команда generate_data).'
+            )
+        )
+        parser.add_argument('--random-seed', type=int, default=42)
+        parser.add_argument(
+            '--scale', type=float, default=1.0,
+            help=(
+                'Множитель размера набора данных generate_data '
+                '(например, 0.01).'
+            )
+        )
+        parser.add_argument(
+            '--requests', type=int, default=50,
+            help='Число замеряемых запросов к каждому эндпоинту.'
+        )
+        parser.add_argument('--warmup', type=int, default=5)
+        parser.add_argument(
+            '--endpoint', action='append', dest='endpoints',
+            help='Замерить только указанные эндпоинты (по имени).'
+        )
+        parser.add_argument('--label', default='', help='Метка прогона.')
+        parser.add_argument('--output', help='Файл для результата.')
+
+    def handle(self, *args, **options):
+        if options['requests'] < 2:
+            raise CommandError('Нужно не меньше двух замеров.')
+
+        rng = random.Random(options['random_seed'])
+
+        if options['seed']:
+            self.seed(options)
+
+        user = self.get_benchmark_user()
+
+        if user is None:
+            raise CommandError(
+                'База пуста, запустите команду с параметром --seed.'
+            )
+
+        token, _ = Token.objects.get_or_create(user=user)
+        results = {
+            'label': options['label'],
+            'created_at': datetime.now(timezone.utc).isoformat(),
+            'database': connection.vendor,
+            'connections': {
+                'engine': connection.settings_dict['ENGINE'],
+                'conn_max_age': connection.settings_dict['CONN_MAX_AGE'],
+                'pool_size': connection.settings_dict.get('POOL_SIZE', 0),
+            },
+            'rows': self.count_rows(),
+            'endpoints': {},
+        }
+
+        for name, url, authenticated in self.get_endpoints(user, rng):
+            if options['endpoints'] and name not in options['endpoints']:
+                continue
+
+            headers = (
+                {'HTTP_AUTHORIZATION': f'Token {token.key}'}
+                if authenticated else {}
+            )
+            results['endpoints'][name] = self.measure(
+                url, headers, options['requests'], options['warmup']
+            )
+            self.stderr.write(f'{name}: {results["endpoints"][name]}')
+
+        output = json.dumps(results, ensure_ascii=False, indent=2)
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                file.write(output)
+        else:
+            self.stdout.write(output)
+
+    def get_benchmark_user(self):
+        """Пользователь с самой большой корзиной."""
+        return User.objects.annotate(
+            cart_size=Count('shopping_cart')
+        ).order_by('-cart_size', 'id').first()
+
+    def get_endpoints(self, user, rng):
+        recipes_count = Recipe.objects.count()
+        recipe = Recipe.objects.order_by('id').only('id')[
+            rng.randrange(recipes_count)
+        ]
+        ingredient = Ingredient.objects.order_by('id').only('name')[
+            rng.randrange(Ingredient.objects.count())
+        ]
+        prefix = ingredient.name[:2]
+        deep_page = max(1, recipes_count // 100 * 9 // 10)
+
+        return (
+            ('recipes_list_anonymous', '/api/recipes/?limit=100', False),
+            ('recipes_list', '/api/recipes/?limit=100', True),
+            (
+                'recipes_list_deep_page',
+                f'/api/recipes/?limit=100&page={deep_page}',
+                True
+            ),
+            (
+                'recipes_list_favorited',
+                '/api/recipes/?is_favorited=1&limit=100',
+                True
+            ),
+            (
+                'recipes_list_in_shopping_cart',
+                '/api/recipes/?is_in_shopping_cart=1&limit=100',
+                True
+            ),
+            (
+                'recipes_list_author',
+                f'/api/recipes/?author={user.id}&limit=100',
+                True
+            ),
+            ('recipe_detail', f'/api/recipes/{recipe.id}/', True),
+            ('recipes_feed', '/api/recipes/feed/?limit=100', True),
+            (
+                'subscriptions',
+                '/api/users/subscriptions/?limit=100&recipes_limit=3',
+                True
+            ),
+            ('users_list', '/api/users/?limit=100', True),
+            ('ingredients_search', f'/api/ingredients/?name={prefix}', False),
+            (
+                'download_shopping_cart',
+                '/api/recipes/download_shopping_cart/',
+                True
+            ),
+        )
+
+    def measure(self, url, headers, requests, warmup):
+        client = Client(SERVER_NAME='localhost')
+
+        for _ in range(warmup):
+            self.request(client, url, headers)
+
+        timings = []
+        queries = []
+        # Соединения с базой, открытые запросами замера. Соединение
+        # из пула тоже вызывает connection_created, поэтому считаются
+        # разные объекты соединений драйвера, а не сигналы.
+        opened = []
+        connections = set()
+
+        def count_connection(sender, connection, **kwargs):
+            opened.append(connection.connection)
+
+        connection_created.connect(count_connection)
+
+        try:
+            for _ in range(requests):
+                with CaptureQueriesContext(connection) as context:
+                    # Соединение, открытое CaptureQueriesContext до
+                    # замера, не считается.
+                    opened.clear()
+                    started = time.perf_counter()
+                    status = self.request(client, url, headers)
+                    timings.append((time.perf_counter() - started) * 1000)
+                    connections.update(opened)
+                queries.append(len(context))
+        finally:
+            connection_created.disconnect(count_connection)
+
+        tracemalloc.start()
+        self.request(client, url, headers)
+        _, peak_memory = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        reset_queries()
+
+        percentiles = statistics.quantiles(timings, n=100, method='inclusive')
+
+        return {
+            'url': url,
+            'status': status,
+            'requests': requests,
+            'p50_ms': round(statistics.median(timings), 3),
+            'p95_ms': round(percentiles[94], 3),
+            'queries': max(queries),
+            'connections_opened': len(connections),
+            'peak_memory_kb': round(peak_memory / 1024, 1),
+        }
+
+    def request(self, client, url, headers):
+        # Тестовый клиент отключает close_old_connections от сигналов
+        # начала и конца запроса, поэтому обработчики сервера
+        # вызываются явно: без этого соединение живет весь замер
+        # при любом DB_CONN_MAX_AGE.
+        close_old_connections()
+        response = client.get(url, **headers)
+
+        if response.streaming:
+            for _ in response.streaming_content:
+                pass
+        response.close()
+        close_old_connections()
+
+        return response.status_code
+
+    def count_rows(self):
+        return {
+            model.__name__: model.objects.count() for model in (
+                User,
+                Ingredient,
+                Recipe,
+                RecipeIngredient,
+                Favorite,
+                ShoppingCart,
+                Subscription,
+            )
+        }
+
+    def seed(self, options):
+        """Заполнение пустой базы командой generate_data."""
+        if Recipe.objects.exists():
+            raise CommandError('Заполнять можно только пустую базу.')
+
+        call_command(
+            'generate_data',
+            seed=options['random_seed'],
+            scale=options['scale'],
+            users=20_000,
+            recipes=200_000,
+            favorites_per_user=120,
+            carts_per_user=120,
+            stdout=self.stderr,
+        )
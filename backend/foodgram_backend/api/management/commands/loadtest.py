@@ -0,0 +1,174 @@
+import json
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from urllib.error import HTTPError
+from urllib.request import HTTPRedirectHandler, Request, build_opener
+
+from django.core.management.base import BaseCommand, CommandError
+
+# Пары синхронный путь - асинхронный путь; одинаковые ответы позволяют
+# сравнивать серверы на одной и той же работе.
+ENDPOINTS = {
+    'recipes_list': (
+        '/api/recipes/?limit=100',
+        '/api/async/recipes/?limit=100',
+    ),
+    'recipe_detail': (
+        '/api/recipes/{recipe}/',
+        '/api/async/recipes/{recipe}/',
+    ),
+    'ingredients_search': (
+        '/api/ingredients/?name={prefix}',
+        '/api/async/ingredients/?name={prefix}',
+    ),
+    'short_link': ('/short/{short_link}/', '/api/async/short/{short_link}/'),
+    'download_shopping_cart': (
+        '/api/recipes/download_shopping_cart/',
+        '/api/async/recipes/download_shopping_cart/',
+    ),
+}
+
+
+class NoRedirectHandler(HTTPRedirectHandler):
+    """Редирект короткой ссылки считается ответом, а не переходом."""
+
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочный тест запущенных серверов: одни и те же эндпоинты '
+        'чтения запрашиваются у WSGI (синхронные представления) и ASGI '
+        '(асинхронные представления) при растущем числе одновременных '
+        'клиентов. Результат выводится в формате JSON.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--wsgi-url', default='http://127.0.0.1:8000',
+            help='Адрес сервера WSGI, например gunicorn.'
+        )
+        parser.add_argument(
+            '--asgi-url', default='http://127.0.0.1:8001',
+            help='Адрес сервера ASGI, например uvicorn.'
+        )
+        parser.add_argument(
+            '--concurrency', type=int, nargs='+', default=[1, 4, 16, 64],
+            help='Уровни числа одновременных клиентов.'
+        )
+        parser.add_argument(
+            '--requests', type=int, default=200,
+            help='Число запросов на каждом уровне.'
+        )
+        parser.add_argument(
+            '--endpoint', action='append', dest='endpoints',
+            choices=ENDPOINTS, help='Проверить только указанные эндпоинты.'
+        )
+        parser.add_argument('--token', help='Токен для авторизации.')
+        parser.add_argument('--recipe', type=int, default=1)
+        parser.add_argument('--prefix', default='ка')
+        parser.add_argument('--short-link', default='1')
+        parser.add_argument('--timeout', type=float, default=30)
+        parser.add_argument('--label', default='', help='Метка прогона.')
+        parser.add_argument('--output', help='Файл для результата.')
+
+    def handle(self, *args, **options):
+        if options['requests'] < 2:
+            raise CommandError('Нужно не меньше двух запросов.')
+
+        self.options = options
+        self.opener = build_opener(NoRedirectHandler)
+        headers = (
+            {'Authorization': f'Token {options["token"]}'}
+            if options['token'] else {}
+        )
+        params = {
+            'recipe': options['recipe'],
+            'prefix': options['prefix'],
+            'short_link': options['short_link'],
+        }
+        results = {
+            'label': options['label'],
+            'created_at': datetime.now(timezone.utc).isoformat(),
+            'requests': options['requests'],
+            'endpoints': {},
+        }
+
+        for name, paths in ENDPOINTS.items():
+            if options['endpoints'] and name not in options['endpoints']:
+                continue
+
+            results['endpoints'][name] = {}
+
+            for server, base_url, path in zip(
+                ('wsgi', 'asgi'),
+                (options['wsgi_url'], options['asgi_url']),
+                paths,
+            ):
+                url = base_url.rstrip('/') + path.format(**params)
+                results['endpoints'][name][server] = [
+                    self.run_level(url, headers, concurrency)
+                    for concurrency in options['concurrency']
+                ]
+                self.stderr.write(
+                    f'{name} {server}: {results["endpoints"][name][server]}'
+                )
+
+        output = json.dumps(results, ensure_ascii=False, indent=2)
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                file.write(output)
+        else:
+            self.stdout.write(output)
+
+    def run_level(self, url, headers, concurrency):
+        """Запросы к url из concurrency потоков одновременно."""
+        timings = []
+        errors = []
+        lock = threading.Lock()
+
+        def request(_):
+            started = time.perf_counter()
+            try:
+                status = self.request(url, headers)
+            except OSError as error:
+                status = str(error)
+            elapsed = (time.perf_counter() - started) * 1000
+
+            with lock:
+                timings.append(elapsed)
+                if not isinstance(status, int) or status >= 400:
+                    errors.append(status)
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(concurrency) as executor:
+            list(executor.map(request, range(self.options['requests'])))
+        duration = time.perf_counter() - started
+
+        percentiles = statistics.quantiles(timings, n=100, method='inclusive')
+
+        return {
+            'concurrency': concurrency,
+            'rps': round(len(timings) / duration, 1),
+            'p50_ms': round(statistics.median(timings), 3),
+            'p95_ms': round(percentiles[94], 3),
+            'errors': len(errors),
+            'error_sample': errors[:3],
+        }
+
+    def request(self, url, headers):
+        try:
+            with self.opener.open(
+                Request(url, headers=headers),
+                timeout=self.options['timeout']
+            ) as response:
+                while response.read(64 * 1024):
+                    pass
+                return response.status
+        except HTTPError as error:
+            return error.code
@@ -0,0 +1,186 @@
+import logging
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+from rest_framework.authtoken.models import Token
+
+from .cache import get_table_versions, make_key
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Действие выполнило больше запросов к базе, чем разрешено."""
+
+
+class QueryCounter:
+    """Обертка для connection.execute_wrapper, считающая запросы."""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class QueryBudgetMixin:
+    """Ограничение числа запросов к базе для действий вьюсета.
+
+    Бюджет задается в query_budget как {действие: число запросов} и не
+    зависит от размера страницы. При превышении в строгом режиме
+    (QUERY_BUDGET_STRICT, включается в тестах) выбрасывается
+    QueryBudgetExceeded, иначе в лог пишется предупреждение.
+    """
+
+    query_budget = {}
+
+    def dispatch(self, request, *args, **kwargs):
+        counter = QueryCounter()
+
+        with connection.execute_wrapper(counter):
+            response = super().dispatch(request, *args, **kwargs)
+
+        budget = self.query_budget.get(getattr(self, 'action', None))
+
+        if budget is not None and counter.count > budget:
+            message = (
+                f'{self.__class__.__name__}.{self.action}: '
+                f'{counter.count} запросов при бюджете {budget}'
+            )
+            if getattr(settings, 'QUERY_BUDGET_STRICT', False):
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+
+        return response
+
+
+class ConditionalGetMixin:
+    """ETag и Last-Modified для GET-запросов без сериализации данных.
+
+    Версия ответа определяется адресом, параметрами запроса, заголовками
+    Accept и Authorization (от пользователя зависят флаги is_favorited
+    и подобные) и версиями данных из get_conditional_versions: по
+    умолчанию это версии таблиц conditional_tables из кеша, поэтому
+    ответ 304 на If-None-Match или If-Modified-Since не требует запросов
+    к базе. Выключается настройкой CONDITIONAL_GET_ENABLED.
+    """
+
+    conditional_actions = ('list', 'retrieve')
+    conditional_tables = ()
+
+    def dispatch(self, request, *args, **kwargs):
+        if (
+            not settings.CONDITIONAL_GET_ENABLED
+            or request.method not in ('GET', 'HEAD')
+            or self.action_map.get('get') not in self.conditional_actions
+        ):
+            return super().dispatch(request, *args, **kwargs)
+
+        versions = self.get_conditional_versions(request, **kwargs)
+
+        if versions is None:
+            return super().dispatch(request, *args, **kwargs)
+
+        authorization = request.META.get('HTTP_AUTHORIZATION', '')
+        etag = quote_etag(make_key(
+            'etag',
+            request.build_absolute_uri(request.path),
+            sorted(request.GET.lists()),
+            request.META.get('HTTP_ACCEPT', ''),
+            authorization,
+            sorted(versions.items()),
+        ).partition(':')[2])
+        # Версии - метки времени в наносекундах; секунда округляется
+        # вверх, чтобы Last-Modified не оказался раньше изменения.
+        last_modified = -(-max(versions.values(), default=0) // 10**9)
+
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+
+        if response is None:
+            response = super().dispatch(request, *args, **kwargs)
+
+        if response.status_code in (200, 304):
+            response.headers.setdefault('ETag', etag)
+            response.headers.setdefault(
+                'Last-Modified', http_date(last_modified)
+            )
+            patch_vary_headers(response, ('Authorization',))
+
+        return response
+
+    def get_conditional_versions(self, request, **kwargs):
+        """Версии данных ответа {имя: метка времени в наносекундах}
+        или None, если условный ответ не нужен (например, объекта нет).
+        """
+        return get_table_versions(self.get_conditional_tables(
+            request, self.conditional_tables
+        ))
+
+    def get_conditional_tables(self, request, tables):
+        if request.META.get('HTTP_AUTHORIZATION'):
+            # Отозванный токен не должен получать 304 вместо 401.
+            tables += (Token._meta.db_table,)
+        return tables
+
+
+class ResponseCacheMixin:
+    """Кеш ответов на анонимные GET-запросы.
+
+    Ключ строится из адреса, отсортированных параметров запроса,
+    заголовка Accept и версий таблиц response_cache_tables. Любая запись
+    в эти таблицы меняет ключ, поэтому устаревший ответ не выдается
+    и сбрасывать кеш по времени не нужно.
+    """
+
+    response_cache_actions = ('list', 'retrieve')
+    response_cache_tables = ()
+
+    def dispatch(self, request, *args, **kwargs):
+        key = self.get_response_cache_key(request)
+
+        if key is None:
+            return super().dispatch(request, *args, **kwargs)
+
+        cache = caches[settings.RESPONSE_CACHE_ALIAS]
+        cached = cache.get(key)
+
+        if cached is not None:
+            content, headers = cached
+            return HttpResponse(content, headers=headers)
+
+        response = super().dispatch(request, *args, **kwargs)
+
+        if response.status_code == 200 and not response.streaming:
+            response.render()
+            cache.set(
+                key,
+                (response.content, dict(response.items())),
+                settings.RESPONSE_CACHE_TIMEOUT
+            )
+
+        return response
+
+    def get_response_cache_key(self, request):
+        """Ключ кеша или None, если ответ кешировать нельзя."""
+        if (
+            not settings.RESPONSE_CACHE_ENABLED
+            or request.method != 'GET'
+            or 'HTTP_AUTHORIZATION' in request.META
+            or self.action_map.get('get') not in self.response_cache_actions
+        ):
+            return None
+
+        return make_key(
+            'response',
+            request.build_absolute_uri(request.path),
+            sorted(request.GET.lists()),
+            request.META.get('HTTP_ACCEPT', ''),
+            get_table_versions(self.response_cache_tables),
+        )
@@ -1,8 +1,209 @@
+import binascii
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import date
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet, ValidationError
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q, QuerySet
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from .cache import get_table_versions, make_key
+
+
+class CachedCountPaginator(Paginator):
+    """Пагинатор, берущий число записей из кеша.
+
+    Ключ кеша строится из SQL запроса и версий всех таблиц, участвующих
+    в нем, поэтому любая запись в эти таблицы делает значение
+    неактуальным. Для таблиц без фильтров на PostgreSQL используется
+    оценка планировщика, если она не меньше
+    PAGINATION_ESTIMATE_COUNT_THRESHOLD; такое число помечается
+    как приблизительное.
+    """
+
+    count_is_approximate = False
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+
+        if not isinstance(queryset, QuerySet):
+            return super().count
+
+        query = queryset.query
+        tables = {
+            alias.table_name for alias in query.alias_map.values()
+        } | {queryset.model._meta.db_table}
+
+        try:
+            sql, params = query.sql_with_params()
+        except EmptyResultSet:
+            return 0
+
+        key = make_key(
+            'count', queryset.db, sql, params, get_table_versions(tables)
+        )
+        result = cache.get(key)
+
+        if result is None:
+            estimate = self.estimate_count(queryset)
+            result = (
+                (estimate, True) if estimate is not None
+                else (super().count, False)
+            )
+            cache.set(key, result, settings.PAGINATION_COUNT_CACHE_TIMEOUT)
+
+        count, self.count_is_approximate = result
+        return count
+
+    def estimate_count(self, queryset):
+        threshold = settings.PAGINATION_ESTIMATE_COUNT_THRESHOLD
+        query = queryset.query
+        connection = connections[queryset.db]
+
+        if (
+            not threshold
+            or connection.vendor != 'postgresql'
+            or query.where
+            or query.distinct
+            or len(query.alias_map) > 1
+        ):
+            return None
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples::bigint FROM pg_class '
+                'WHERE oid = %s::regclass',
+                [queryset.model._meta.db_table]
+            )
+            row = cursor.fetchone()
+
+        if row and row[0] >= threshold:
+            return row[0]
+        return None
 
 
 class CustomPagination(PageNumberPagination):
+    """Постраничная пагинация с необязательным режимом курсора.
+
+    Число записей берется из кеша (CachedCountPaginator). Если у вьюсета
+    задан cursor_ordering и в запросе есть параметр
+    cursor (для первой страницы - пустой), страница выбирается по ключу
+    последней записи предыдущей страницы, без COUNT и OFFSET. Поэтому
+    дальние страницы обходятся так же дешево, как первая.
+    """
 
+    django_paginator_class = CachedCountPaginator
     page_size_query_param = 'limit'
     page_size = 10
     max_page_size = 100
+    cursor_query_param = 'cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_ordering = getattr(view, 'cursor_ordering', None)
+
+        if (
+            self.cursor_ordering is None
+            or self.cursor_query_param not in request.query_params
+        ):
+            self.cursor_ordering = None
+            return super().paginate_queryset(queryset, request, view)
+
+        self.request = request
+        page_size = self.get_page_size(request)
+        position = self.decode_cursor(
+            request.query_params[self.cursor_query_param]
+        )
+        queryset = queryset.order_by(*self.cursor_ordering)
+
+        if position is not None:
+            try:
+                queryset = queryset.filter(self.get_keyset_filter(position))
+            except (TypeError, ValueError, ValidationError):
+                raise NotFound('Неверный курсор.')
+
+        results = list(queryset[:page_size + 1])
+        self.next_position = None
+
+        if len(results) > page_size:
+            results = results[:page_size]
+            self.next_position = [
+                getattr(results[-1], field.lstrip('-'))
+                for field in self.cursor_ordering
+            ]
+
+        return results
+
+    def get_paginated_response(self, data):
+        if self.cursor_ordering is None:
+            response = super().get_paginated_response(data)
+
+            if self.page.paginator.count_is_approximate:
+                response.data['count_is_approximate'] = True
+
+            return response
+
+        return Response({
+            'next': self.get_next_cursor_link(),
+            'previous': None,
+            'results': data,
+        })
+
+    def get_keyset_filter(self, position):
+        """Условие «после записи position» для упорядочивания
+        cursor_ordering, например для ('-pub_date', 'name', 'id'):
+        pub_date < p OR (pub_date = p AND name > n)
+        OR (pub_date = p AND name = n AND id > i).
+        """
+        condition = Q()
+        equal = {}
+
+        for field, value in zip(self.cursor_ordering, position):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            condition |= Q(**equal, **{f'{name}__{lookup}': value})
+            equal[name] = value
+
+        return condition
+
+    def get_next_cursor_link(self):
+        if self.next_position is None:
+            return None
+
+        return replace_query_param(
+            self.request.build_absolute_uri(),
+            self.cursor_query_param,
+            self.encode_cursor(self.next_position)
+        )
+
+    def encode_cursor(self, position):
+        data = json.dumps([
+            value.isoformat() if isinstance(value, date) else value
+            for value in position
+        ])
+        return urlsafe_b64encode(data.encode()).decode()
+
+    def decode_cursor(self, cursor):
+        if not cursor:
+            return None
+
+        try:
+            position = json.loads(urlsafe_b64decode(cursor.encode()))
+        except (binascii.Error, ValueError):
+            raise NotFound('Неверный курсор.')
+
+        if (
+            not isinstance(position, list)
+            or len(position) != len(self.cursor_ordering)
+        ):
+            raise NotFound('Неверный курсор.')
+
+        return position
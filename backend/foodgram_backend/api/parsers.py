@@ -0,0 +1,31 @@
+from django.conf import settings
+from rest_framework import exceptions, parsers, status
+
+
+class RequestTooLarge(exceptions.APIException):
+    status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    default_detail = 'Слишком большой запрос.'
+    default_code = 'request_too_large'
+
+
+class SizeLimitedJSONParser(parsers.JSONParser):
+    """JSON-парсер, отклоняющий тело больше DATA_UPLOAD_MAX_MEMORY_SIZE.
+
+    Размер проверяется по заголовку Content-Length, до чтения тела:
+    DRF читает поток запроса сам, в обход проверки Django.
+    """
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        request = (parser_context or {}).get('request')
+        limit = settings.DATA_UPLOAD_MAX_MEMORY_SIZE
+
+        if request is not None and limit is not None:
+            try:
+                length = int(request.META.get('CONTENT_LENGTH') or 0)
+            except ValueError:
+                length = 0
+
+            if length > limit:
+                raise RequestTooLarge()
+
+        return super().parse(stream, media_type, parser_context)
@@ -0,0 +1,128 @@
+from recipes.models import Favorite, ShoppingCart
+from users.models import Subscription
+
+
+class UserRelations:
+    """Связи текущего пользователя с рецептами и авторами.
+
+    Хранит id рецептов в избранном и в корзине, а также id авторов,
+    на которых подписан пользователь. Данные загружаются пачкой для всех
+    объектов страницы (не более трех запросов), после чего сериализаторы
+    читают флаги без обращения к базе.
+    """
+
+    def __init__(self, user):
+        self.user = user
+        self._loaded_recipes = set()
+        self._loaded_authors = set()
+        self._favorites = set()
+        self._shopping_cart = set()
+        self._subscriptions = set()
+
+    @property
+    def is_active(self):
+        return bool(self.user and self.user.is_authenticated)
+
+    def load_recipes(self, recipes):
+        """Загрузка флагов избранного, корзины и подписок для рецептов."""
+        recipes = list(recipes)
+        self.load_authors(recipe.author_id for recipe in recipes)
+        recipe_ids = self._get_new_recipe_ids(recipes)
+
+        if recipe_ids:
+            favorites, shopping_cart = self._get_recipe_queries(recipe_ids)
+            self._favorites.update(favorites)
+            self._shopping_cart.update(shopping_cart)
+            self._loaded_recipes.update(recipe_ids)
+
+    def load_authors(self, author_ids):
+        """Загрузка подписок пользователя на указанных авторов."""
+        author_ids = self._get_new_author_ids(author_ids)
+
+        if author_ids:
+            self._subscriptions.update(
+                self._get_subscriptions_query(author_ids)
+            )
+            self._loaded_authors.update(author_ids)
+
+    async def aload_recipes(self, recipes):
+        """Асинхронный вариант load_recipes для async-представлений."""
+        recipes = list(recipes)
+        await self.aload_authors(recipe.author_id for recipe in recipes)
+        recipe_ids = self._get_new_recipe_ids(recipes)
+
+        if recipe_ids:
+            favorites, shopping_cart = self._get_recipe_queries(recipe_ids)
+            self._favorites.update([
+                recipe_id async for recipe_id in favorites
+            ])
+            self._shopping_cart.update([
+                recipe_id async for recipe_id in shopping_cart
+            ])
+            self._loaded_recipes.update(recipe_ids)
+
+    async def aload_authors(self, author_ids):
+        author_ids = self._get_new_author_ids(author_ids)
+
+        if author_ids:
+            self._subscriptions.update([
+                author_id async for author_id
+                in self._get_subscriptions_query(author_ids)
+            ])
+            self._loaded_authors.update(author_ids)
+
+    def _get_new_recipe_ids(self, recipes):
+        if not self.is_active:
+            return set()
+
+        return {recipe.id for recipe in recipes} - self._loaded_recipes
+
+    def _get_new_author_ids(self, author_ids):
+        if not self.is_active:
+            return set()
+
+        return set(author_ids) - self._loaded_authors
+
+    def _get_recipe_queries(self, recipe_ids):
+        return (
+            Favorite.objects.filter(
+                user=self.user, recipe_id__in=recipe_ids
+            ).values_list('recipe_id', flat=True),
+            ShoppingCart.objects.filter(
+                user=self.user, recipe_id__in=recipe_ids
+            ).values_list('recipe_id', flat=True),
+        )
+
+    def _get_subscriptions_query(self, author_ids):
+        return Subscription.objects.filter(
+            user=self.user, following_id__in=author_ids
+        ).values_list('following_id', flat=True)
+
+    def is_favorited(self, recipe):
+        self.load_recipes((recipe,))
+        return recipe.id in self._favorites
+
+    def is_in_shopping_cart(self, recipe):
+        self.load_recipes((recipe,))
+        return recipe.id in self._shopping_cart
+
+    def is_subscribed(self, author):
+        self.load_authors((author.id,))
+        return author.id in self._subscriptions
+
+
+def get_user_relations(context):
+    """Получение общего для всего запроса объекта UserRelations.
+
+    Объект хранится в контексте сериализатора, который разделяют
+    вложенные сериализаторы и ReadRecipeSerializer, используемый
+    в CreateUpdateRecipeSerializer.to_representation.
+    """
+    relations = context.get('user_relations')
+
+    if relations is None:
+        request = context.get('request')
+        relations = UserRelations(request.user if request else None)
+        context['user_relations'] = relations
+
+    return relations
@@ -1,10 +1,14 @@
 import base64
+import binascii
 
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.files.base import ContentFile
+from django.db import models, transaction
 from rest_framework import serializers
 
 from constants import RecipeConstants
+from recipes.images import get_variant_urls, get_variants_field
 from recipes.models import (
     Ingredient,
     Recipe,
@@ -12,21 +16,77 @@ from recipes.models import (
 )
 from users.models import Subscription
 
+from .cache import bump_table_version
+from .relations import get_user_relations
+
 User = get_user_model()
 
 
+class UserRelationsListSerializer(serializers.ListSerializer):
+    """Загружает связи пользователя сразу для всех объектов страницы."""
+
+    def to_representation(self, data):
+        if isinstance(data, models.manager.BaseManager):
+            data = data.all()
+
+        data = list(data)
+        self.child.load_relations(get_user_relations(self.context), data)
+
+        return super().to_representation(data)
+
+
 class Base64ImageField(serializers.ImageField):
-    """Преобразование из формата base64 в изображение."""
+    """Преобразование из формата base64 в изображение.
+
+    Размер проверяется по длине строки, до декодирования.
+    """
 
     def to_internal_value(self, data):
 
         if isinstance(data, str) and data.startswith('data:image'):
-            format, imgstr = data.split(';base64,')
+            format, _, imgstr = data.partition(';base64,')
             ext = format.split('/')[-1]
-            data = ContentFile(base64.b64decode(imgstr), name='temp.' + ext)
+            size = len(imgstr) * 3 // 4 - imgstr[-2:].count('=')
+
+            if size > settings.IMAGE_UPLOAD_MAX_SIZE:
+                raise serializers.ValidationError(
+                    'Размер изображения не должен превышать '
+                    f'{settings.IMAGE_UPLOAD_MAX_SIZE // 2 ** 20} МБ.'
+                )
+
+            try:
+                content = base64.b64decode(imgstr, validate=True)
+            except binascii.Error:
+                raise serializers.ValidationError(
+                    'Некорректное изображение в base64.'
+                )
+
+            data = ContentFile(content, name='temp.' + ext)
         return super().to_internal_value(data)
 
 
+class ImageVariantsField(serializers.Field):
+    """Адреса уменьшенных копий изображения по размерам и форматам:
+    {"thumb": {"webp": ..., "jpg": ...}, "card": ..., "full": ...}.
+    Пока копии не созданы, значение null.
+    """
+
+    def __init__(self, image_field, **kwargs):
+        self.image_field = image_field
+        kwargs.setdefault('source', '*')
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, instance):
+        request = self.context.get('request')
+
+        return get_variant_urls(
+            getattr(instance, self.image_field),
+            getattr(instance, get_variants_field(self.image_field)),
+            request.build_absolute_uri if request else str
+        )
+
+
 class AvatarSerializer(serializers.ModelSerializer):
     """Используется для PUT-запроса для добавления аватара."""
 
@@ -36,11 +96,18 @@ class AvatarSerializer(serializers.ModelSerializer):
         model = User
         fields = ('avatar', )
 
+    def update(self, instance, validated_data):
+        """Сохранение только аватара, не затирая счетчики пользователя."""
+        instance.avatar = validated_data['avatar']
+        instance.save(update_fields=('avatar',))
+        return instance
+
 
 class UserSerializer(serializers.ModelSerializer):
     """Используется для POST- и GET- запросов при работе с пользователями."""
 
     is_subscribed = serializers.SerializerMethodField()
+    avatar_variants = ImageVariantsField('avatar')
 
     class Meta:
         model = User
@@ -52,14 +119,15 @@ class UserSerializer(serializers.ModelSerializer):
             'last_name',
             'is_subscribed',
             'avatar',
+            'avatar_variants',
         )
+        list_serializer_class = UserRelationsListSerializer
 
-    def get_is_subscribed(self, following):
-        request = self.context.get('request')
+    def load_relations(self, relations, users):
+        relations.load_authors(user.id for user in users)
 
-        if request and request.user.is_authenticated:
-            return request.user.followers.filter(following=following).exists()
-        return False
+    def get_is_subscribed(self, following):
+        return get_user_relations(self.context).is_subscribed(following)
 
 
 class SetPasswordSerializer(serializers.Serializer):
@@ -110,6 +178,7 @@ class ReadRecipeSerializer(serializers.ModelSerializer):
     )
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
+    image_variants = ImageVariantsField('image')
 
     class Meta:
         model = Recipe
@@ -121,25 +190,23 @@ class ReadRecipeSerializer(serializers.ModelSerializer):
             'is_in_shopping_cart',
             'name',
             'image',
+            'image_variants',
             'text',
             'cooking_time',
+            'favorites_count',
         )
+        list_serializer_class = UserRelationsListSerializer
+
+    def load_relations(self, relations, recipes):
+        relations.load_recipes(recipes)
 
     def get_is_favorited(self, recipe):
         """Проверка наличия рецепта в избранных."""
-        request = self.context.get('request')
-
-        if request and request.user.is_authenticated:
-            return request.user.favorites.filter(recipe=recipe).exists()
-        return False
+        return get_user_relations(self.context).is_favorited(recipe)
 
     def get_is_in_shopping_cart(self, recipe):
         """Проверка наличия рецепта в корзине."""
-        request = self.context.get('request')
-
-        if request and request.user.is_authenticated:
-            return request.user.shopping_cart.filter(recipe=recipe).exists()
-        return False
+        return get_user_relations(self.context).is_in_shopping_cart(recipe)
 
 
 class WriteRecipeIngredientSerializer(serializers.ModelSerializer):
@@ -197,7 +264,12 @@ class CreateUpdateRecipeSerializer(serializers.ModelSerializer):
         return super().validate(value)
 
     def ingredients_bulk_create(self, ingredients, recipe):
-        """Создание списка ингредиентов для рецепта одним запросом."""
+        """Создание списка ингредиентов для рецепта одним запросом.
+
+        Сигналы сохранения не отправляются, поэтому метод подходит только
+        для нового рецепта, которого еще нет в списках покупок, а версию
+        таблицы для кеша ответов меняет сам.
+        """
         RecipeIngredient.objects.bulk_create([
             RecipeIngredient(
                 recipe=recipe,
@@ -205,7 +277,9 @@ class CreateUpdateRecipeSerializer(serializers.ModelSerializer):
                 amount=ingredient['amount']
             ) for ingredient in ingredients
         ])
+        bump_table_version(RecipeIngredient._meta.db_table)
 
+    @transaction.atomic
     def create(self, validated_data):
         """Создание рецепта с добавлением в него ингридиентов."""
         ingredients = validated_data.pop('ingredients')
@@ -218,6 +292,7 @@ class CreateUpdateRecipeSerializer(serializers.ModelSerializer):
 
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         """Изменение рецепта и его ингридиентов."""
 
@@ -232,10 +307,33 @@ class CreateUpdateRecipeSerializer(serializers.ModelSerializer):
             )
 
         ingredients = validated_data.pop('ingredients')
-        instance = super().update(instance, validated_data)
-        instance.recipe_ingredients.all().delete()
 
-        self.ingredients_bulk_create(ingredients, instance)
+        # Сохраняются только измененные поля, чтобы не перезаписать
+        # favorites_count, увеличенный параллельным запросом.
+        for field, value in validated_data.items():
+            setattr(instance, field, value)
+        instance.save(update_fields=[*validated_data, 'updated_at'])
+
+        # Строки меняются по одной: итоги списков покупок обновляют
+        # сигналы RecipeIngredient (recipes.signals).
+        amounts = {
+            ingredient['id'].id: ingredient['amount']
+            for ingredient in ingredients
+        }
+        instance.recipe_ingredients.exclude(
+            ingredient_id__in=amounts
+        ).delete()
+
+        for recipe_ingredient in instance.recipe_ingredients.all():
+            amount = amounts.pop(recipe_ingredient.ingredient_id)
+            if recipe_ingredient.amount != amount:
+                recipe_ingredient.amount = amount
+                recipe_ingredient.save(update_fields=('amount',))
+
+        for ingredient_id, amount in amounts.items():
+            RecipeIngredient.objects.create(
+                recipe=instance, ingredient_id=ingredient_id, amount=amount
+            )
 
         return instance
 
@@ -250,16 +348,29 @@ class MinifiedRecipeSerializer(serializers.ModelSerializer):
      и списку покупок.
      """
 
+    image_variants = ImageVariantsField('image')
+
     class Meta:
         model = Recipe
         fields = (
             'id',
             'name',
             'image',
+            'image_variants',
             'cooking_time',
         )
 
 
+def get_recipes_limit(request):
+    """Значение параметра recipes_limit или None, если он не задан."""
+    recipes_limit = request.query_params.get('recipes_limit')
+
+    if recipes_limit and recipes_limit.isdigit():
+        return int(recipes_limit)
+
+    return None
+
+
 class SubscriptionSerializer(UserSerializer):
     """Используется для GET- и POST- запросов при работе с подписками."""
 
@@ -270,8 +381,9 @@ class SubscriptionSerializer(UserSerializer):
     last_name = serializers.CharField(source='following.last_name')
     is_subscribed = serializers.SerializerMethodField()
     recipes = serializers.SerializerMethodField()
-    recipes_count = serializers.SerializerMethodField()
+    recipes_count = serializers.IntegerField(source='following.recipes_count')
     avatar = serializers.ImageField(source='following.avatar', required=False)
+    avatar_variants = ImageVariantsField('avatar', source='following')
 
     class Meta:
         model = Subscription
@@ -284,7 +396,8 @@ class SubscriptionSerializer(UserSerializer):
             'is_subscribed',
             'recipes',
             'recipes_count',
-            'avatar'
+            'avatar',
+            'avatar_variants',
         )
 
     def get_is_subscribed(self, obj):
@@ -292,16 +405,14 @@ class SubscriptionSerializer(UserSerializer):
         return True
 
     def get_recipes(self, obj):
-        """Получение списка рецептов пользователя."""
-        request = self.context.get('request')
-        recipes_limit = request.query_params.get('recipes_limit')
-        queryset = obj.following.recipes.all()
+        """Рецепты автора: из prefetch вьюсета или отдельным запросом."""
+        recipes = getattr(obj.following, 'latest_recipes', None)
 
-        if recipes_limit and recipes_limit.isdigit():
-            queryset = queryset[:int(recipes_limit)]
+        if recipes is None:
+            recipes = obj.following.recipes.all()
+            limit = get_recipes_limit(self.context.get('request'))
 
-        return MinifiedRecipeSerializer(queryset, many=True).data
+            if limit is not None:
+                recipes = recipes[:limit]
 
-    def get_recipes_count(self, obj):
-        """Подсчет количества рецептов."""
-        return obj.following.recipes.count()
+        return MinifiedRecipeSerializer(recipes, many=True).data
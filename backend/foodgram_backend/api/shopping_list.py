@@ -0,0 +1,92 @@
+import csv
+import json
+
+# Число строк, читаемых из базы за один раз при выгрузке.
+CHUNK_SIZE = 500
+
+
+class Echo:
+    """Объект с методом write для csv.writer, возвращающий строку."""
+
+    def write(self, value):
+        return value
+
+
+class TxtFormat:
+    content_type = 'text/plain; charset=utf-8'
+    header = footer = ''
+
+    @staticmethod
+    def row(number, ingredient):
+        return (
+            ('\n' if number else '')
+            + f"{ingredient['ingredient__name']} - "
+            f"{ingredient['total_amount']} "
+            f"{ingredient['ingredient__measurement_unit']}"
+        )
+
+
+class CsvFormat:
+    content_type = 'text/csv; charset=utf-8'
+    writer = csv.writer(Echo())
+    header = writer.writerow(('name', 'amount', 'measurement_unit'))
+    footer = ''
+
+    @classmethod
+    def row(cls, number, ingredient):
+        return cls.writer.writerow((
+            ingredient['ingredient__name'],
+            ingredient['total_amount'],
+            ingredient['ingredient__measurement_unit'],
+        ))
+
+
+class JsonFormat:
+    content_type = 'application/json'
+    header = '['
+    footer = ']'
+
+    @staticmethod
+    def row(number, ingredient):
+        return (',' if number else '') + json.dumps({
+            'name': ingredient['ingredient__name'],
+            'measurement_unit': ingredient['ingredient__measurement_unit'],
+            'amount': ingredient['total_amount'],
+        }, ensure_ascii=False)
+
+
+FORMATS = {
+    'txt': TxtFormat,
+    'csv': CsvFormat,
+    'json': JsonFormat,
+}
+
+
+def stream_shopping_list(queryset, file_format):
+    """Генератор строк списка покупок и тип содержимого для формата."""
+    output = FORMATS[file_format]
+
+    def generate():
+        yield output.header
+        for number, ingredient in enumerate(
+            queryset.iterator(chunk_size=CHUNK_SIZE)
+        ):
+            yield output.row(number, ingredient)
+        yield output.footer
+
+    return generate(), output.content_type
+
+
+def astream_shopping_list(queryset, file_format):
+    """Асинхронный вариант stream_shopping_list для ASGI."""
+    output = FORMATS[file_format]
+
+    async def generate():
+        yield output.header
+        number = 0
+        async for ingredient in queryset.aiterator(chunk_size=CHUNK_SIZE):
+            yield output.row(number, ingredient)
+            number += 1
+        yield output.footer
+
+    return generate(), output.content_type
@@ -0,0 +1,66 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from recipes.models import (
+    Favorite,
+    Ingredient,
+    Recipe,
+    RecipeIngredient,
+    ShoppingCart,
+)
+from users.models import Subscription
+
+from .authentication import invalidate_token
+from .cache import bump_table_version, short_links
+
+User = get_user_model()
+
+# Модели, версии таблиц которых входят в ключи кеша ответов, COUNT
+# пагинации и ETag. Обработчик удаления отключает быстрое удаление
+# queryset.delete(), поэтому подключается только к ним; ленту подписок
+# FeedEntryManager отмечает сам.
+VERSIONED_MODELS = (
+    User,
+    Token,
+    Subscription,
+    Ingredient,
+    Recipe,
+    RecipeIngredient,
+    Favorite,
+    ShoppingCart,
+)
+
+
+def bump_model_version(sender, using, **kwargs):
+    """Смена версии таблицы при сохранении или удалении записи."""
+    bump_table_version(sender._meta.db_table, using)
+
+
+for model in VERSIONED_MODELS:
+    post_save.connect(bump_model_version, sender=model)
+    post_delete.connect(bump_model_version, sender=model)
+
+
+@receiver(post_delete, sender=Recipe)
+def forget_short_link(instance, **kwargs):
+    short_links.delete(instance.short_link)
+
+
+@receiver(post_delete, sender=Token)
+def forget_token(instance, **kwargs):
+    """Выход пользователя или удаление токена."""
+    invalidate_token(instance.key)
+
+
+@receiver((post_save, post_delete), sender=User)
+def forget_user_tokens(instance, created=False, **kwargs):
+    """Смена пароля, деактивация и другие изменения пользователя."""
+    if created:
+        return
+
+    for key in Token.objects.filter(user_id=instance.pk).values_list(
+        'key', flat=True
+    ):
+        invalidate_token(key)
@@ -0,0 +1,599 @@
+from io import StringIO
+from unittest import mock, skipUnless
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient, APITestCase
+
+from recipes import ingredient_index
+from recipes.models import (
+    Favorite,
+    FeedEntry,
+    Ingredient,
+    Recipe,
+    RecipeIngredient,
+    ShoppingCart,
+    ShoppingCartTotal,
+)
+from recipes.search import search_recipes
+from tasks.models import Task
+from tasks.registry import get_task
+from users.models import Subscription
+
+from .authentication import CachedTokenAuthentication
+from .cache import LRUCache
+
+User = get_user_model()
+
+PAGE_SIZES = (1, 10, 50)
+
+
+def create_user(username):
+    return User.objects.create_user(
+        email=f'{username}@example.com', username=username,
+        password='pass12345!', first_name='Тест', last_name='Тест'
+    )
+
+
+def create_recipe(author, amounts, name='Рецепт', text='Описание'):
+    """Рецепт с ингредиентами amounts [(ингредиент, количество)]."""
+    recipe = Recipe.objects.create(
+        author=author, name=name, text=text, cooking_time=10,
+        image='recipes/images/test.png'
+    )
+    RecipeIngredient.objects.bulk_create(
+        RecipeIngredient(recipe=recipe, ingredient=ingredient, amount=amount)
+        for ingredient, amount in amounts
+    )
+    return recipe
+
+
+@override_settings(QUERY_BUDGET_STRICT=True, RESPONSE_CACHE_ENABLED=False)
+class QueryBudgetTests(TestCase):
+    """Число запросов действий RecipeViewSet не зависит от размера
+    страницы и укладывается в query_budget; при превышении строгий
+    режим выбрасывает QueryBudgetExceeded.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = User.objects.create_user(
+            email='reader@example.com', username='reader',
+            password='pass12345!', first_name='Читатель', last_name='Тест'
+        )
+        cls.token = Token.objects.create(user=cls.reader)
+        ingredients = Ingredient.objects.bulk_create(
+            Ingredient(name=f'Ингредиент {i}', measurement_unit='г')
+            for i in range(10)
+        )
+        authors = [
+            User.objects.create_user(
+                email=f'author{i}@example.com', username=f'author{i}',
+                password='pass12345!', first_name='Автор', last_name='Тест'
+            ) for i in range(3)
+        ]
+
+        for number in range(60):
+            recipe = Recipe.objects.create(
+                author=authors[number % len(authors)],
+                name=f'Рецепт {number}',
+                text='Описание',
+                cooking_time=10,
+                image='recipes/images/test.png',
+            )
+            RecipeIngredient.objects.bulk_create(
+                RecipeIngredient(
+                    recipe=recipe,
+                    ingredient=ingredients[(number + i) % len(ingredients)],
+                    amount=i + 1
+                ) for i in range(3)
+            )
+
+            if number % 2:
+                Favorite.objects.create(user=cls.reader, recipe=recipe)
+            if number % 3:
+                ShoppingCart.objects.create(user=cls.reader, recipe=recipe)
+
+        cls.recipe = recipe
+
+        for author in authors:
+            Subscription.objects.create(user=cls.reader, following=author)
+
+    def setUp(self):
+        cache.clear()
+        self.anonymous = APIClient()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def get(self, client, url):
+        response = client.get(url)
+        self.assertEqual(response.status_code, 200, url)
+        return response
+
+    def test_list(self):
+        for limit in PAGE_SIZES:
+            for client in (self.anonymous, self.client):
+                with self.subTest(limit=limit, client=client):
+                    response = self.get(client, f'/api/recipes/?limit={limit}')
+                    self.assertEqual(len(response.data['results']), limit)
+
+    def test_filtered_list(self):
+        for limit in PAGE_SIZES:
+            with self.subTest(limit=limit):
+                self.get(
+                    self.client,
+                    f'/api/recipes/?limit={limit}&is_favorited=1'
+                    '&is_in_shopping_cart=1'
+                )
+
+    def test_cursor_list(self):
+        for limit in PAGE_SIZES:
+            with self.subTest(limit=limit):
+                response = self.get(
+                    self.client, f'/api/recipes/?limit={limit}&cursor='
+                )
+                self.get(self.client, response.data['next'])
+
+    def test_retrieve(self):
+        for client in (self.anonymous, self.client):
+            with self.subTest(client=client):
+                self.get(client, f'/api/recipes/{self.recipe.id}/')
+
+    def test_feed(self):
+        for limit in PAGE_SIZES:
+            with self.subTest(limit=limit):
+                response = self.get(
+                    self.client, f'/api/recipes/feed/?limit={limit}'
+                )
+                self.assertEqual(len(response.data['results']), limit)
+
+
+class ConditionalGetTests(TestCase):
+    """ETag и 304 строятся по версиям данных и выключаются настройкой."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            email='author@example.com', username='author',
+            password='pass12345!', first_name='Автор', last_name='Тест'
+        )
+        cls.recipe = Recipe.objects.create(
+            author=cls.author, name='Рецепт', text='Описание',
+            cooking_time=10, image='recipes/images/test.png'
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    @override_settings(CONDITIONAL_GET_ENABLED=False)
+    def test_disabled(self):
+        response = self.client.get('/api/recipes/')
+        self.assertNotIn('ETag', response.headers)
+
+    @override_settings(CONDITIONAL_GET_ENABLED=True)
+    def test_not_modified_until_change(self):
+        for url in ('/api/recipes/', f'/api/recipes/{self.recipe.id}/'):
+            with self.subTest(url=url):
+                etag = self.client.get(url).headers['ETag']
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+
+                self.recipe.name = f'Рецепт {url}'
+                self.recipe.save()
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+                self.assertNotEqual(response.headers['ETag'], etag)
+
+
+class ShoppingCartTotalTests(APITestCase):
+    """Итоги списка покупок меняются вместе с корзиной и ингредиентами
+    рецептов в ней.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = create_user('author')
+        cls.buyer = create_user('buyer')
+        cls.salt, cls.flour, cls.sugar = Ingredient.objects.bulk_create(
+            Ingredient(name=name, measurement_unit='г')
+            for name in ('соль', 'мука', 'сахар')
+        )
+        cls.bread = create_recipe(
+            cls.author, [(cls.salt, 10), (cls.flour, 500)]
+        )
+        cls.cake = create_recipe(
+            cls.author, [(cls.flour, 200), (cls.sugar, 100)]
+        )
+
+    def get_totals(self, user):
+        return dict(ShoppingCartTotal.objects.filter(user=user).values_list(
+            'ingredient_id', 'amount'
+        ))
+
+    def post_cart(self, user, recipe, method='post'):
+        self.client.force_authenticate(user)
+        response = getattr(self.client, method)(
+            f'/api/recipes/{recipe.id}/shopping_cart/'
+        )
+        self.assertIn(response.status_code, (201, 204))
+
+    def test_add_and_remove(self):
+        self.post_cart(self.buyer, self.bread)
+        self.assertEqual(
+            self.get_totals(self.buyer),
+            {self.salt.id: 10, self.flour.id: 500}
+        )
+
+        self.post_cart(self.buyer, self.cake)
+        self.assertEqual(
+            self.get_totals(self.buyer),
+            {self.salt.id: 10, self.flour.id: 700, self.sugar.id: 100}
+        )
+
+        self.post_cart(self.buyer, self.bread, 'delete')
+        self.assertEqual(
+            self.get_totals(self.buyer),
+            {self.flour.id: 200, self.sugar.id: 100}
+        )
+
+        self.post_cart(self.buyer, self.cake, 'delete')
+        self.assertEqual(self.get_totals(self.buyer), {})
+
+    def test_ingredient_edit(self):
+        self.post_cart(self.buyer, self.bread)
+        self.post_cart(self.author, self.bread)
+        self.post_cart(self.author, self.cake)
+
+        self.client.force_authenticate(self.author)
+        response = self.client.patch(
+            f'/api/recipes/{self.bread.id}/',
+            {'ingredients': [
+                {'id': self.flour.id, 'amount': 300},
+                {'id': self.sugar.id, 'amount': 5},
+            ]},
+            format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+
+        self.assertEqual(
+            self.get_totals(self.buyer),
+            {self.flour.id: 300, self.sugar.id: 5}
+        )
+        self.assertEqual(
+            self.get_totals(self.author),
+            {self.flour.id: 500, self.sugar.id: 105}
+        )
+
+    def test_recipe_delete(self):
+        self.post_cart(self.buyer, self.bread)
+        self.post_cart(self.buyer, self.cake)
+
+        self.client.force_authenticate(self.author)
+        response = self.client.delete(f'/api/recipes/{self.bread.id}/')
+        self.assertEqual(response.status_code, 204)
+
+        self.assertEqual(
+            self.get_totals(self.buyer),
+            {self.flour.id: 200, self.sugar.id: 100}
+        )
+
+
+class CounterTests(APITestCase):
+    """Денормализованные счетчики избранного, рецептов и подписчиков
+    и их сверка командой reconcile_counters.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = create_user('author')
+        cls.reader = create_user('reader')
+        cls.recipe = create_recipe(cls.author, ())
+
+    def setUp(self):
+        self.client.force_authenticate(self.reader)
+
+    def refresh(self):
+        self.recipe.refresh_from_db()
+        self.author.refresh_from_db()
+
+    def test_favorites_count(self):
+        url = f'/api/recipes/{self.recipe.id}/favorite/'
+
+        self.assertEqual(self.client.post(url).status_code, 201)
+        self.refresh()
+        self.assertEqual(self.recipe.favorites_count, 1)
+        response = self.client.get(f'/api/recipes/{self.recipe.id}/')
+        self.assertEqual(response.data['favorites_count'], 1)
+
+        self.assertEqual(self.client.delete(url).status_code, 204)
+        self.refresh()
+        self.assertEqual(self.recipe.favorites_count, 0)
+
+    def test_recipes_count(self):
+        self.refresh()
+        self.assertEqual(self.author.recipes_count, 1)
+
+        recipe = create_recipe(self.author, ())
+        self.refresh()
+        self.assertEqual(self.author.recipes_count, 2)
+
+        recipe.delete()
+        self.refresh()
+        self.assertEqual(self.author.recipes_count, 1)
+
+    def test_subscribers_count(self):
+        url = f'/api/users/{self.author.id}/subscribe/'
+
+        self.assertEqual(self.client.post(url).status_code, 201)
+        self.refresh()
+        self.assertEqual(self.author.subscribers_count, 1)
+
+        self.assertEqual(self.client.delete(url).status_code, 204)
+        self.refresh()
+        self.assertEqual(self.author.subscribers_count, 0)
+
+    def test_reconcile_counters(self):
+        Favorite.objects.create(user=self.reader, recipe=self.recipe)
+        Subscription.objects.create(user=self.reader, following=self.author)
+        Recipe.objects.update(favorites_count=5)
+        User.objects.filter(pk=self.author.pk).update(
+            recipes_count=0, subscribers_count=3
+        )
+
+        output = StringIO()
+        call_command('reconcile_counters', '--check', stdout=output)
+        self.assertIn(
+            'Recipe.favorites_count: расхождений 1', output.getvalue()
+        )
+        self.refresh()
+        self.assertEqual(self.recipe.favorites_count, 5)
+
+        call_command('reconcile_counters', stdout=StringIO())
+        self.refresh()
+        self.assertEqual(self.recipe.favorites_count, 1)
+        self.assertEqual(self.author.recipes_count, 1)
+        self.assertEqual(self.author.subscribers_count, 1)
+
+        output = StringIO()
+        call_command('reconcile_counters', '--check', stdout=output)
+        self.assertEqual(output.getvalue().count('расхождений 0'), 3)
+
+
+class FeedTests(APITestCase):
+    """Лента подписок: заполнение при подписке, рассылка новых рецептов
+    в очереди задач, очистка при отписке и дописывание рецептов
+    популярных авторов при чтении.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = create_user('author')
+        cls.reader = create_user('reader')
+        cls.other = create_user('other')
+        cls.old_recipe = create_recipe(cls.author, (), name='Старый')
+        # Рассылка рецепта автора без подписчиков ничего не делает.
+        Task.objects.all().delete()
+
+    def setUp(self):
+        self.client.force_authenticate(self.reader)
+
+    def subscribe(self, user, method='post'):
+        self.client.force_authenticate(user)
+        response = getattr(self.client, method)(
+            f'/api/users/{self.author.id}/subscribe/'
+        )
+        self.assertIn(response.status_code, (201, 204))
+        self.client.force_authenticate(self.reader)
+
+    def run_tasks(self, name):
+        """Выполнение задач name из очереди, как это делает воркер."""
+        tasks = list(Task.objects.filter(name=name))
+
+        for task in tasks:
+            get_task(task.name)(*task.args, **task.kwargs)
+            task.delete()
+
+        return len(tasks)
+
+    def get_feed(self):
+        response = self.client.get('/api/recipes/feed/')
+        self.assertEqual(response.status_code, 200)
+        return [recipe['id'] for recipe in response.data['results']]
+
+    def get_entries(self, user):
+        return set(FeedEntry.objects.filter(user=user).values_list(
+            'recipe_id', flat=True
+        ))
+
+    def test_backfill_and_prune(self):
+        self.subscribe(self.reader)
+        self.assertEqual(self.get_feed(), [self.old_recipe.id])
+
+        self.subscribe(self.reader, 'delete')
+        self.assertEqual(self.get_entries(self.reader), set())
+        self.assertEqual(self.get_feed(), [])
+
+    def test_fan_out(self):
+        self.subscribe(self.reader)
+        recipe = create_recipe(self.author, (), name='Новый')
+        self.assertNotIn(recipe.id, self.get_entries(self.reader))
+
+        self.assertEqual(self.run_tasks('recipes.tasks.fan_out_recipe'), 1)
+        self.assertEqual(self.get_feed(), [recipe.id, self.old_recipe.id])
+        self.assertNotIn(recipe.id, self.get_entries(self.other))
+
+    @override_settings(FEED_FANOUT_MAX_SUBSCRIBERS=0)
+    def test_pull_popular_author(self):
+        self.subscribe(self.reader)
+        recipe = create_recipe(self.author, (), name='Новый')
+
+        self.assertEqual(self.run_tasks('recipes.tasks.fan_out_recipe'), 0)
+        self.assertNotIn(recipe.id, self.get_entries(self.reader))
+
+        self.assertEqual(self.get_feed(), [recipe.id, self.old_recipe.id])
+        self.assertIn(recipe.id, self.get_entries(self.reader))
+
+    @override_settings(FEED_FANOUT_MAX_SUBSCRIBERS=1)
+    def test_fan_out_after_unsubscribe(self):
+        self.subscribe(self.reader)
+        self.subscribe(self.other)
+        recipe = create_recipe(self.author, (), name='Новый')
+        self.assertEqual(self.run_tasks('recipes.tasks.fan_out_recipe'), 0)
+
+        # Автор снова укладывается в порог: его рецепты рассылаются
+        # оставшимся подписчикам одной задачей.
+        self.subscribe(self.other, 'delete')
+        self.assertEqual(self.run_tasks('recipes.tasks.fan_out_author'), 1)
+        self.assertEqual(
+            self.get_entries(self.reader), {recipe.id, self.old_recipe.id}
+        )
+
+
+@override_settings(AUTH_TOKEN_CACHE_TTL=300)
+class TokenCacheTests(APITestCase):
+    """Кеш аутентификации по токену сбрасывается при выходе,
+    деактивации и смене пароля.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('reader')
+
+    def setUp(self):
+        cache.clear()
+        # Срок записей кеша процесса задается при импорте модуля.
+        patcher = mock.patch.object(
+            CachedTokenAuthentication, 'tokens', LRUCache(100, ttl=300)
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def get_me(self):
+        return self.client.get('/api/users/me/').status_code
+
+    def deactivate_silently(self):
+        """Деактивация в обход моделей: сигналы кеш не сбрасывают."""
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+
+    def test_cached(self):
+        self.assertEqual(self.get_me(), 200)
+
+        self.deactivate_silently()
+        self.assertEqual(self.get_me(), 200)
+
+    def test_logout(self):
+        self.assertEqual(self.get_me(), 200)
+
+        response = self.client.post('/api/auth/token/logout/')
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.get_me(), 401)
+
+    def test_deactivate(self):
+        self.assertEqual(self.get_me(), 200)
+
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.get_me(), 401)
+
+    def test_set_password(self):
+        self.assertEqual(self.get_me(), 200)
+
+        response = self.client.post('/api/users/set_password/', {
+            'current_password': 'pass12345!',
+            'new_password': 'newpass12345!',
+        })
+        self.assertEqual(response.status_code, 204)
+
+        # Пользователь перечитывается из базы при следующем запросе.
+        self.deactivate_silently()
+        self.assertEqual(self.get_me(), 401)
+
+
+class SearchTests(APITestCase):
+    """Полнотекстовый поиск по названию и описанию с ранжированием:
+    совпадение в названии выше совпадения в описании.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = create_user('author')
+        cls.soup = create_recipe(
+            cls.author, (), name='Щи', text='Суп, квашеная капуста'
+        )
+        cls.stew = create_recipe(
+            cls.author, (), name='Тушеная капуста', text='Овощи'
+        )
+        cls.salad = create_recipe(
+            cls.author, (), name='Салат', text='Огурцы и помидоры'
+        )
+
+    def search(self, value):
+        response = self.client.get('/api/recipes/', {'search': value})
+        self.assertEqual(response.status_code, 200)
+        return [recipe['id'] for recipe in response.data['results']]
+
+    def test_ranked(self):
+        self.assertEqual(self.search('капуста'), [self.stew.id, self.soup.id])
+        self.assertEqual(self.search('огурцы'), [self.salad.id])
+        self.assertEqual(self.search('борщ'), [])
+
+    def test_follows_changes(self):
+        self.salad.name = 'Салат: капуста и морковь'
+        self.salad.save()
+        self.assertIn(self.salad.id, self.search('капуста'))
+
+        self.stew.delete()
+        self.assertNotIn(self.stew.id, self.search('капуста'))
+
+    @skipUnless(connection.vendor == 'sqlite', 'триггеры FTS5 SQLite')
+    def test_triggers_restored_after_migrate(self):
+        with connection.cursor() as cursor:
+            cursor.execute('DROP TRIGGER recipes_recipe_fts_insert')
+
+        recipe = create_recipe(self.author, (), name='Капуста по-гурийски')
+        self.assertFalse(self.find('гурийски').exists())
+
+        call_command('migrate', verbosity=0)
+        self.assertEqual(list(self.find('гурийски')), [recipe])
+
+    def find(self, value):
+        return search_recipes(Recipe.objects.all(), value)
+
+
+class IngredientSearchTests(APITestCase):
+    """Поиск ингредиентов по индексу в памяти и запросом к базе дает
+    одинаковый результат: сначала совпадения по началу названия.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        Ingredient.objects.bulk_create(
+            Ingredient(name=name, measurement_unit='г')
+            for name in ('фасоль', 'соль', 'сахар', 'морская соль')
+        )
+
+    def setUp(self):
+        cache.clear()
+        ingredient_index.invalidate()
+
+    def search(self, value):
+        response = self.client.get('/api/ingredients/', {'name': value})
+        self.assertEqual(response.status_code, 200)
+        return [ingredient['name'] for ingredient in response.data]
+
+    def test_search(self):
+        for enabled in (True, False):
+            with self.subTest(index=enabled), override_settings(
+                INGREDIENT_INDEX_ENABLED=enabled
+            ):
+                self.assertEqual(
+                    self.search('соль'), ['соль', 'морская соль', 'фасоль']
+                )
+                self.assertEqual(self.search('са'), ['сахар'])
+                self.assertEqual(self.search('перец'), [])
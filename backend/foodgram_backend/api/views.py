@@ -1,18 +1,20 @@
 from django.contrib.auth import get_user_model
 from django.conf import settings
-from django.db.models import Sum
-from django.http import HttpResponse, HttpResponseRedirect
+from django.db.models import F, Prefetch
+from django.http import HttpResponseRedirect, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
-from django.urls import reverse
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
 from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
 
+from recipes.ingredient_index import ingredient_index
 from recipes.models import (
     Favorite,
+    FeedEntry,
     Ingredient,
     Recipe,
     RecipeIngredient,
@@ -20,9 +22,16 @@ from recipes.models import (
 )
 from users.models import Subscription
 
+from .cache import get_table_versions, short_links
 from .filters import IngredientFilter, RecipeFilter
+from .mixins import (
+    ConditionalGetMixin,
+    QueryBudgetMixin,
+    ResponseCacheMixin,
+)
 from .pagination import CustomPagination
 from .permissions import IsOwnerOrReadOnly
+from .renderers import CSVRenderer, PlainTextRenderer
 from .serializers import (
     AvatarSerializer,
     CreateUpdateRecipeSerializer,
@@ -31,16 +40,23 @@ from .serializers import (
     IngredientSerializer,
     MinifiedRecipeSerializer,
     ReadRecipeSerializer,
-    UserSerializer
+    UserSerializer,
+    get_recipes_limit,
 )
+from .shopping_list import stream_shopping_list
 
 User = get_user_model()
 
 
-class CustomUserViewSet(UserViewSet):
+class CustomUserViewSet(ConditionalGetMixin, UserViewSet):
 
     serializer_class = UserSerializer
     pagination_class = CustomPagination
+    conditional_actions = ('list', 'retrieve', 'me')
+    conditional_tables = (
+        User._meta.db_table,
+        Subscription._meta.db_table,
+    )
 
     def get_queryset(self):
         return User.objects.all()
@@ -82,8 +98,10 @@ class CustomUserViewSet(UserViewSet):
 
         elif request.method == 'DELETE':
 
-            request.user.avatar.delete()
-            request.user.save()
+            # Файл может быть общим с другими записями (хранилище по хешу
+            # содержимого), его удалит collect_media_garbage.
+            request.user.avatar = ''
+            request.user.save(update_fields=('avatar',))
             return Response(status=status.HTTP_204_NO_CONTENT)
 
     @action(
@@ -106,26 +124,123 @@ class CustomUserViewSet(UserViewSet):
             )
 
         request.user.set_password(serializer.validated_data['new_password'])
-        request.user.save()
+        request.user.save(update_fields=('password',))
 
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-class IngridientViewSet(viewsets.ReadOnlyModelViewSet):
+class IngridientViewSet(
+    ConditionalGetMixin, ResponseCacheMixin, viewsets.ReadOnlyModelViewSet
+):
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     permission_classes = (AllowAny,)
     filter_backends = (DjangoFilterBackend,)
     filterset_class = IngredientFilter
+    response_cache_tables = (Ingredient._meta.db_table,)
+    conditional_tables = response_cache_tables
+
+    def list(self, request, *args, **kwargs):
+        """Поиск по названию через индекс в памяти, без запроса к базе."""
+        name = request.query_params.get('name')
 
+        if name is None or not settings.INGREDIENT_INDEX_ENABLED:
+            return super().list(request, *args, **kwargs)
+
+        serializer = self.get_serializer(
+            ingredient_index.search(name), many=True
+        )
+        return Response(serializer.data)
 
-class RecipeViewSet(viewsets.ModelViewSet):
+
+class RecipeViewSet(
+    ConditionalGetMixin,
+    ResponseCacheMixin,
+    QueryBudgetMixin,
+    viewsets.ModelViewSet
+):
     queryset = Recipe.objects.all()
     serializer_class = ReadRecipeSerializer
     pagination_class = CustomPagination
     permission_classes = (IsOwnerOrReadOnly, )
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
+    cursor_ordering = ('-pub_date', 'name', 'id')
+    response_cache_tables = (
+        Recipe._meta.db_table,
+        RecipeIngredient._meta.db_table,
+        Ingredient._meta.db_table,
+        User._meta.db_table,
+        Favorite._meta.db_table,
+    )
+    # Для авторизованных ответ зависит еще от корзины и подписок.
+    conditional_tables = response_cache_tables + (
+        ShoppingCart._meta.db_table,
+        Subscription._meta.db_table,
+    )
+    # Карточка рецепта: кроме даты его изменения (updated_at сдвигают
+    # и изменения ингредиентов, копий изображения, счетчика избранного
+    # и данных автора) ответ зависит от справочника ингредиентов, а для
+    # авторизованных - от их избранного, корзины и подписок.
+    conditional_detail_tables = (Ingredient._meta.db_table,)
+    conditional_user_tables = (
+        Favorite._meta.db_table,
+        ShoppingCart._meta.db_table,
+        Subscription._meta.db_table,
+    )
+    # Токен, рецепты, ингредиенты и три запроса связей пользователя;
+    # в списке дополнительно COUNT для пагинации. Лента читает еще
+    # подписки и свои записи, а при подписке на популярных авторов
+    # дописывает их новые рецепты (выборка, вставка, отметка времени).
+    query_budget = {
+        'list': 7,
+        'retrieve': 6,
+        'feed': 13,
+    }
+
+    def get_queryset(self):
+        """Загрузка автора и ингредиентов рецептов для чтения."""
+        queryset = super().get_queryset()
+
+        if self.action in ('list', 'retrieve', 'feed'):
+            queryset = queryset.select_related('author').prefetch_related(
+                Prefetch(
+                    'recipe_ingredients',
+                    queryset=RecipeIngredient.objects.select_related(
+                        'ingredient'
+                    ).order_by('ingredient__name')
+                )
+            )
+
+        return queryset
+
+    def get_conditional_versions(self, request, **kwargs):
+        """Для карточки - версии по дате изменения рецепта, а не по
+        таблицам: запись в другой рецепт ее ETag не меняет.
+        """
+        if self.action_map.get('get') != 'retrieve':
+            return super().get_conditional_versions(request, **kwargs)
+
+        try:
+            updated_at = Recipe.objects.filter(pk=kwargs['pk']).values_list(
+                'updated_at', flat=True
+            ).first()
+        except (TypeError, ValueError):
+            updated_at = None
+
+        if updated_at is None:
+            return None
+
+        tables = self.conditional_detail_tables
+
+        if request.META.get('HTTP_AUTHORIZATION'):
+            tables += self.conditional_user_tables
+
+        versions = get_table_versions(
+            self.get_conditional_tables(request, tables)
+        )
+        versions['recipe'] = int(updated_at.timestamp() * 10**6) * 1000
+        return versions
 
     def get_serializer_class(self):
         """Назначение сериализатора в зависимости от действия."""
@@ -134,6 +249,32 @@ class RecipeViewSet(viewsets.ModelViewSet):
 
         return ReadRecipeSerializer
 
+    @action(
+        detail=False,
+        methods=('GET',),
+        permission_classes=(IsAuthenticated,),
+        cursor_ordering=('-pub_date', '-recipe_id'),
+    )
+    def feed(self, request):
+        """Рецепты авторов, на которых подписан пользователь.
+
+        Страница ленты читается из FeedEntry по индексу
+        (user, -pub_date, -recipe), затем загружаются сами рецепты.
+        """
+        FeedEntry.objects.pull(request.user)
+        entries = self.paginate_queryset(
+            request.user.feed_entries.order_by(
+                '-pub_date', '-recipe_id'
+            ).prefetch_related(
+                Prefetch('recipe', queryset=self.get_queryset())
+            )
+        )
+        serializer = self.get_serializer(
+            [entry.recipe for entry in entries], many=True
+        )
+
+        return self.get_paginated_response(serializer.data)
+
     @action(
         detail=True,
         methods=('GET',),
@@ -143,7 +284,7 @@ class RecipeViewSet(viewsets.ModelViewSet):
         """Получение короткой ссылки на рецепт."""
         link = (
             f'{settings.ALLOWED_HOSTS[0]}/short/'
-            f'{self.get_object().create_short_link()}/'
+            f'{self.get_object().short_link}/'
         )
 
         return Response({'short-link': link}, status=status.HTTP_200_OK)
@@ -183,29 +324,23 @@ class RecipeViewSet(viewsets.ModelViewSet):
     @action(
         detail=False,
         methods=['get'],
-        permission_classes=[IsAuthenticated]
+        permission_classes=[IsAuthenticated],
+        renderer_classes=(PlainTextRenderer, CSVRenderer, JSONRenderer),
     )
     def download_shopping_cart(self, request):
-        """Преобразование списка покупок в текстовый файл."""
-        ingredients = RecipeIngredient.objects.filter(
-            recipe__added_in_shopping_cart_by__user=request.user
-        ).values(
+        """Потоковая выгрузка списка покупок в формате txt, csv или json."""
+        ingredients = request.user.shopping_cart_totals.values(
             'ingredient__name',
-            'ingredient__measurement_unit'
-        ).annotate(total_amount=Sum('amount'))
-
-        shopping_list = []
-        for ingredient in ingredients:
-            shopping_list.append(
-                f"{ingredient['ingredient__name']} - "
-                f"{ingredient['total_amount']} "
-                f"{ingredient['ingredient__measurement_unit']}"
-            )
+            'ingredient__measurement_unit',
+            total_amount=F('amount')
+        ).order_by('ingredient__name')
+
+        file_format = request.accepted_renderer.format
+        content, content_type = stream_shopping_list(ingredients, file_format)
 
-        response = HttpResponse('\n'.join(shopping_list),
-                                content_type='text/plain')
+        response = StreamingHttpResponse(content, content_type=content_type)
         response['Content-Disposition'] = (
-            'attachment; filename="shopping_list.txt"'
+            f'attachment; filename="shopping_list.{file_format}"'
         )
 
         return response
@@ -242,20 +377,51 @@ class RecipeViewSet(viewsets.ModelViewSet):
 
 
 def get_recipe_by_short_link(request, short_link):
-    """Получение рецепта при помощи постоянной короткой ссылки."""
-    recipe = get_object_or_404(Recipe, short_link=short_link)
-    url = reverse('recipe_detail', args=[recipe.id])
+    """Переход на страницу рецепта по постоянной короткой ссылке."""
+    recipe_id = short_links.get(short_link)
 
-    return HttpResponseRedirect(url)
+    if recipe_id is None:
+        recipe_id = get_object_or_404(
+            Recipe.objects.values_list('id', flat=True),
+            short_link=short_link
+        )
+        short_links.set(short_link, recipe_id)
 
+    return HttpResponseRedirect(f'/recipes/{recipe_id}')
 
-class SubscriptionViewSet(viewsets.ModelViewSet):
+
+class SubscriptionViewSet(QueryBudgetMixin, viewsets.ModelViewSet):
     serializer_class = SubscriptionSerializer
     permission_classes = (IsAuthenticated,)
     pagination_class = CustomPagination
+    cursor_ordering = ('id',)
+    query_budget = {'list': 4}
 
     def get_queryset(self):
-        return self.request.user.followers.all()
+        """Подписки вместе с авторами и их последними рецептами.
+
+        Срез в Prefetch Django выполняет оконной функцией ROW_NUMBER()
+        с разбиением по автору, поэтому страница загружается тремя
+        запросами при любых limit и recipes_limit.
+        """
+        queryset = self.request.user.followers.select_related(
+            'following'
+        ).order_by('id')
+
+        if self.action != 'list':
+            return queryset
+
+        recipes = Recipe.objects.only(
+            'id', 'name', 'image', 'image_variants', 'cooking_time', 'author'
+        )
+        limit = get_recipes_limit(self.request)
+
+        if limit is not None:
+            recipes = recipes[:limit]
+
+        return queryset.prefetch_related(Prefetch(
+            'following__recipes', queryset=recipes, to_attr='latest_recipes'
+        ))
 
     def create(self, request, *args, **kwargs):
         """Подписка пользователя на другого."""
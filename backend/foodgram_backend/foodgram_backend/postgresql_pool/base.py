@@ -0,0 +1,121 @@
+"""Бэкенд PostgreSQL с пулом соединений на стороне приложения.
+
+Подключается через ENGINE = 'foodgram_backend.postgresql_pool'. Вместо
+закрытия соединение возвращается в пул процесса и выдается следующему
+запросу, поэтому установка соединения (TCP, TLS, аутентификация) не
+входит во время ответа. Размер пула и время ожидания свободного
+соединения задаются ключами POOL_SIZE и POOL_TIMEOUT настроек базы.
+"""
+import threading
+from collections import deque
+
+from django.db import OperationalError
+from django.db.backends.postgresql import base
+from django.db.backends.postgresql.psycopg_any import IsolationLevel
+from psycopg2 import extensions
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+class ConnectionPool:
+    """Не больше size соединений; свободные выдаются в порядке LIFO."""
+
+    def __init__(self, size, timeout):
+        self.timeout = timeout
+        self._idle = deque()
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(size)
+
+    def acquire(self, connect, check):
+        if not self._slots.acquire(timeout=self.timeout):
+            raise OperationalError(
+                'Нет свободных соединений с базой в пуле.'
+            )
+
+        try:
+            while True:
+                with self._lock:
+                    connection = self._idle.pop() if self._idle else None
+
+                if connection is None:
+                    return connect()
+
+                if not connection.closed and check(connection):
+                    return connection
+
+                self._discard(connection)
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def release(self, connection):
+        try:
+            status = connection.info.transaction_status
+            if connection.closed or status == (
+                extensions.TRANSACTION_STATUS_UNKNOWN
+            ):
+                self._discard(connection)
+                return
+
+            if status != extensions.TRANSACTION_STATUS_IDLE:
+                connection.rollback()
+
+            with self._lock:
+                self._idle.append(connection)
+        except Exception:
+            self._discard(connection)
+        finally:
+            self._slots.release()
+
+    def _discard(self, connection):
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    @property
+    def pool(self):
+        with _pools_lock:
+            if self.alias not in _pools:
+                _pools[self.alias] = ConnectionPool(
+                    self.settings_dict.get('POOL_SIZE', 10),
+                    self.settings_dict.get('POOL_TIMEOUT', 30),
+                )
+            return _pools[self.alias]
+
+    def get_new_connection(self, conn_params):
+        connection = self.pool.acquire(
+            lambda: super(DatabaseWrapper, self).get_new_connection(
+                conn_params
+            ),
+            self.is_pooled_connection_usable,
+        )
+        # Родительский метод задает уровень изоляции при создании
+        # соединения; для соединения из пула он задается здесь.
+        self.isolation_level = IsolationLevel(
+            self.settings_dict['OPTIONS'].get(
+                'isolation_level', IsolationLevel.READ_COMMITTED
+            )
+        )
+        return connection
+
+    def is_pooled_connection_usable(self, connection):
+        if not self.settings_dict['CONN_HEALTH_CHECKS']:
+            return True
+
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+            if not connection.autocommit:
+                connection.rollback()
+        except Exception:
+            return False
+        return True
+
+    def _close(self):
+        if self.connection is not None:
+            self.pool.release(self.connection)
@@ -46,6 +46,7 @@ INSTALLED_APPS = [
     'users.apps.UsersConfig',
     'recipes.apps.RecipesConfig',
     'api.apps.ApiConfig',
+    'tasks.apps.TasksConfig',
 ]
 
 MIDDLEWARE = [
@@ -82,15 +83,33 @@ WSGI_APPLICATION = 'foodgram_backend.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
+# DB_CONN_MAX_AGE - сколько секунд соединение живет между запросами
+# (0 - закрывается после каждого запроса), DB_CONN_HEALTH_CHECKS - проверка
+# соединения перед повторным использованием. При DB_POOL_SIZE > 0
+# соединения берутся из пула процесса (foodgram_backend.postgresql_pool)
+# и возвращаются в него после каждого запроса.
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 0))
+
 if os.getenv('POSTGRES_USING') == 'True':    
     DATABASES = {
         'default': {
-            'ENGINE': 'django.db.backends.postgresql',
+            'ENGINE': (
+                'foodgram_backend.postgresql_pool' if DB_POOL_SIZE
+                else 'django.db.backends.postgresql'
+            ),
             'NAME': os.getenv('POSTGRES_DB', 'django'),
             'USER': os.getenv('POSTGRES_USER', 'django'),
             'PASSWORD': os.getenv('POSTGRES_PASSWORD', ''),
             'HOST': os.getenv('DB_HOST', ''),
-            'PORT': os.getenv('DB_PORT', 5432)
+            'PORT': os.getenv('DB_PORT', 5432),
+            'CONN_MAX_AGE': (
+                0 if DB_POOL_SIZE else int(os.getenv('DB_CONN_MAX_AGE', 60))
+            ),
+            'CONN_HEALTH_CHECKS': (
+                os.getenv('DB_CONN_HEALTH_CHECKS', 'True') == 'True'
+            ),
+            'POOL_SIZE': DB_POOL_SIZE,
+            'POOL_TIMEOUT': int(os.getenv('DB_POOL_TIMEOUT', 30)),
         }
     }
 else:
@@ -153,7 +172,13 @@ REST_FRAMEWORK = {
     ],
 
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
+    ],
+
+    'DEFAULT_PARSER_CLASSES': [
+        'api.parsers.SizeLimitedJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
     ],
 
     # 'DEFAULT_PAGINATION_CLASS': 'api.pagination.CustomPagination',
@@ -167,5 +192,137 @@ DJOSER = {
     },
 }
 
+# Превышение бюджета запросов вьюсетов (api.mixins.QueryBudgetMixin)
+# приводит к ошибке, а не к предупреждению в логе.
+QUERY_BUDGET_STRICT = os.getenv('QUERY_BUDGET_STRICT', 'False') == 'True'
+
+# Поиск ингредиентов по названию: через индекс в памяти процесса
+# (recipes.ingredient_index) или, при False, запросом к базе
+# (api.filters.IngredientFilter, на PostgreSQL - по триграммному индексу).
+# Результаты одинаковы. Срок, после которого индекс перестраивается даже
+# без сигнала об изменениях (например, при локальном кеше в нескольких
+# процессах).
+INGREDIENT_INDEX_ENABLED = (
+    os.getenv('INGREDIENT_INDEX_ENABLED', 'True') == 'True'
+)
+INGREDIENT_INDEX_TTL = int(os.getenv('INGREDIENT_INDEX_TTL', 300))
+
+# Кеширование COUNT для пагинации (api.pagination.CachedCountPaginator):
+# срок жизни значения и размер таблицы, начиная с которого для запросов
+# без фильтров на PostgreSQL используется оценка планировщика
+# (0 - всегда точный подсчет).
+PAGINATION_COUNT_CACHE_TIMEOUT = int(
+    os.getenv('PAGINATION_COUNT_CACHE_TIMEOUT', 300)
+)
+PAGINATION_ESTIMATE_COUNT_THRESHOLD = int(
+    os.getenv('PAGINATION_ESTIMATE_COUNT_THRESHOLD', 100_000)
+)
+
+# Лента подписок (recipes.models.FeedEntry): число подписчиков, до которого
+# новый рецепт сразу записывается в их ленты (у более популярных авторов
+# рецепты дописываются при чтении ленты), и число последних рецептов
+# автора, добавляемых в ленту при подписке.
+FEED_FANOUT_MAX_SUBSCRIBERS = int(
+    os.getenv('FEED_FANOUT_MAX_SUBSCRIBERS', 10_000)
+)
+FEED_BACKFILL_SIZE = int(os.getenv('FEED_BACKFILL_SIZE', 100))
+
+# Число кодов коротких ссылок, которые каждый процесс держит в памяти,
+# и время жизни записи в секундах. Удаление рецепта сбрасывает запись
+# только в своем процессе; остальные процессы перенаправляют по коду
+# удаленного рецепта не дольше SHORT_LINK_CACHE_TTL.
+SHORT_LINK_CACHE_SIZE = int(os.getenv('SHORT_LINK_CACHE_SIZE', 10_000))
+SHORT_LINK_CACHE_TTL = int(os.getenv('SHORT_LINK_CACHE_TTL', 60))
+
+# Кеш Django: версии таблиц, COUNT для пагинации и ответы API. По умолчанию
+# данные хранятся в памяти процесса; если процессов или серверов
+# несколько, нужен общий бэкенд: файловый
+# (django.core.cache.backends.filebased.FileBasedCache с каталогом
+# в CACHE_LOCATION), Redis, Memcached или любой сторонний.
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', ''),
+    },
+}
+
+# Кеш ответов на анонимные запросы (api.mixins.ResponseCacheMixin):
+# алиас из CACHES и срок хранения. Устаревший ответ не выдается и до
+# истечения срока, так как ключ содержит версии таблиц. Версии меняют
+# и другие процессы (воркер задач, команды), поэтому с кешем в памяти
+# процесса кеш ответов по умолчанию выключен.
+RESPONSE_CACHE_ALIAS = os.getenv('RESPONSE_CACHE_ALIAS', 'default')
+RESPONSE_CACHE_ENABLED = os.getenv(
+    'RESPONSE_CACHE_ENABLED',
+    str(
+        CACHES[RESPONSE_CACHE_ALIAS]['BACKEND']
+        != 'django.core.cache.backends.locmem.LocMemCache'
+    )
+) == 'True'
+RESPONSE_CACHE_TIMEOUT = int(os.getenv('RESPONSE_CACHE_TIMEOUT', 24 * 3600))
+
+# Заголовки ETag и Last-Modified (api.mixins.ConditionalGetMixin) строятся
+# по версиям таблиц в кеше Django. Записи других процессов меняют версии
+# только в общем кеше, иначе клиенты получали бы 304 на устаревшие данные,
+# поэтому с кешем в памяти процесса условные ответы по умолчанию
+# выключены.
+CONDITIONAL_GET_ENABLED = os.getenv(
+    'CONDITIONAL_GET_ENABLED',
+    str(
+        CACHES['default']['BACKEND']
+        != 'django.core.cache.backends.locmem.LocMemCache'
+    )
+) == 'True'
+
+# Кеш аутентификации по токену (api.authentication): число токенов
+# в памяти процесса и время жизни записи в секундах (0 - без кеша).
+# Выход и деактивация сбрасывают запись в других процессах через версию
+# токена в кеше Django, поэтому кеш включен по умолчанию только с общим
+# бэкендом. С кешем в памяти процесса (LocMemCache) и ненулевым сроком
+# токен остается действительным в других процессах до
+# AUTH_TOKEN_CACHE_TTL секунд после выхода или деактивации.
+AUTH_TOKEN_CACHE_SIZE = int(os.getenv('AUTH_TOKEN_CACHE_SIZE', 10_000))
+AUTH_TOKEN_CACHE_TTL = int(os.getenv(
+    'AUTH_TOKEN_CACHE_TTL',
+    0 if CACHES['default']['BACKEND'] == (
+        'django.core.cache.backends.locmem.LocMemCache'
+    ) else 300
+))
+
+# Уменьшенные копии изображений (recipes.images): наибольшие ширина
+# и высота каждой копии и качество WebP и JPEG. Копии создаются
+# в очереди фоновых задач.
+IMAGE_VARIANTS = {
+    'thumb': (160, 160),
+    'card': (480, 480),
+    'full': (1280, 1280),
+}
+IMAGE_QUALITY = int(os.getenv('IMAGE_QUALITY', 82))
+
+# Наибольший размер загружаемого изображения в байтах. Тело запроса
+# с изображением в base64 на треть больше; JSON-запросы крупнее
+# отклоняются по заголовку Content-Length, до чтения тела
+# (api.parsers.SizeLimitedJSONParser).
+IMAGE_UPLOAD_MAX_SIZE = int(os.getenv('IMAGE_UPLOAD_MAX_SIZE', 5 * 2 ** 20))
+DATA_UPLOAD_MAX_MEMORY_SIZE = IMAGE_UPLOAD_MAX_SIZE * 4 // 3 + 2 ** 16
+
+# Очередь фоновых задач в базе (приложение tasks): число задач, которые
+# воркер run_tasks выполняет одновременно, пауза между опросами пустой
+# очереди, время, после которого задача упавшего воркера выдается снова,
+# задержка перед первым повтором (дальше удваивается) и число попыток
+# по умолчанию. При TASKS_EAGER=True задачи выполняются в том же процессе
+# сразу после фиксации транзакции, без воркера.
+TASKS_WORKERS = int(os.getenv('TASKS_WORKERS', 4))
+TASKS_POLL_INTERVAL = float(os.getenv('TASKS_POLL_INTERVAL', 1))
+TASKS_VISIBILITY_TIMEOUT = int(os.getenv('TASKS_VISIBILITY_TIMEOUT', 600))
+TASKS_RETRY_DELAY = int(os.getenv('TASKS_RETRY_DELAY', 30))
+TASKS_MAX_ATTEMPTS = int(os.getenv('TASKS_MAX_ATTEMPTS', 3))
+TASKS_EAGER = os.getenv('TASKS_EAGER', 'False') == 'True'
+
+# Каталог с файлами данных (ингредиенты, фикстуры).
+DATA_DIR = Path(os.getenv('DATA_DIR', BASE_DIR.parent.parent / 'data'))
+
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
@@ -0,0 +1,94 @@
+"""Хранилище файлов с именами по хешу содержимого.
+
+Файл сохраняется как <каталог>/ab/cd/<sha256>.<расширение>: одинаковое
+содержимое получает одно имя и записывается один раз, а два уровня
+подкаталогов по первым символам хеша ограничивают число записей
+в каталоге. Содержимое по адресу не меняется, поэтому такие файлы можно
+кешировать без срока (см. gateway/nginx.conf).
+"""
+import hashlib
+import os
+import posixpath
+import re
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.core.files.utils import validate_file_name
+
+CHUNK_SIZE = 64 * 1024
+
+# Имя уже адресовано по содержимому: ab/cd/abcd...<64 символа>...
+ADDRESSED_NAME = re.compile(
+    r'(?:^|/)([0-9a-f]{2})/([0-9a-f]{2})/\1\2[0-9a-f]{60}[^/]*$'
+)
+
+
+def get_content_hash(content):
+    digest = hashlib.sha256()
+    content.seek(0)
+
+    for chunk in content.chunks(CHUNK_SIZE):
+        digest.update(chunk)
+
+    content.seek(0)
+    return digest.hexdigest()
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """Файловое хранилище, дедуплицирующее файлы при записи.
+
+    Имена, уже имеющие вид адреса (например, копии изображения
+    <sha256>.thumb.webp рядом с исходником), сохраняются как есть.
+    Файлы могут быть общими для нескольких записей, поэтому удалять их
+    при очистке поля нельзя: это делает collect_media_garbage.
+    """
+
+    def get_content_name(self, name, content):
+        if ADDRESSED_NAME.search(name):
+            return name
+
+        digest = get_content_hash(content)
+        extension = posixpath.splitext(name)[1].lower()
+
+        return posixpath.join(
+            posixpath.dirname(name),
+            digest[:2],
+            digest[2:4],
+            digest + extension
+        )
+
+    def save(self, name, content, max_length=None):
+        """Сохранение без подбора свободного имени: имя определяется
+        содержимым, а существующий файл с ним уже нужный.
+        """
+        if name is None:
+            name = content.name
+
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+
+        validate_file_name(name, allow_relative_path=True)
+        name = self._save(self.get_content_name(name, content), content)
+        validate_file_name(name, allow_relative_path=True)
+        return name
+
+    def get_available_name(self, name, max_length=None):
+        # FileSystemStorage._save вызывает метод, только если файл
+        # появился во время записи: его с тем же содержимым записал
+        # другой процесс.
+        raise FileExistsError(name)
+
+    def _save(self, name, content):
+        if self.exists(name):
+            # Свежее время изменения защищает файл, снова получивший
+            # ссылку, от collect_media_garbage с --min-age.
+            os.utime(self.path(name))
+            return name
+
+        try:
+            return super()._save(name, content)
+        except FileExistsError:
+            return name
+
+
+image_storage = ContentAddressedStorage()
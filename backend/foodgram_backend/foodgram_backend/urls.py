@@ -7,6 +7,7 @@ from api.views import get_recipe_by_short_link
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('api/async/', include('api.async_urls')),
     path('api/', include('api.urls')),
     path('short/<slug:short_link>/', get_recipe_by_short_link)
 ]
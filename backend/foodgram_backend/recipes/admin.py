@@ -14,15 +14,12 @@ class RecipeAdmin(admin.ModelAdmin):
         'id',
         'name',
         'author',
+        'favorites_count',
     )
-    readonly_fields = ('favorites',)
+    readonly_fields = ('favorites_count',)
 
     search_fields = ('name', 'author__username',)
 
-    def favorites(self, recipe):
-        return recipe.favorited_by.count()
-    favorites.short_description = 'Число добавлений в избранное'
-
 
 class IngridientAdmin(admin.ModelAdmin):
     list_display = (
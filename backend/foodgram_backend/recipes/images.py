@@ -0,0 +1,163 @@
+import hashlib
+import io
+import logging
+import posixpath
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db.models.signals import post_save
+from django.utils import timezone
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from foodgram_backend.storage import ADDRESSED_NAME
+
+logger = logging.getLogger(__name__)
+
+# Форматы копий: WebP и JPEG для клиентов без поддержки WebP.
+FORMATS = (
+    ('webp', 'WEBP'),
+    ('jpg', 'JPEG'),
+)
+
+
+def get_variants_field(field_name):
+    """Имя JSON-поля с копиями для поля изображения."""
+    return f'{field_name}_variants'
+
+
+def get_variants_version():
+    """Хеш параметров копий: размеров всех копий (каждая строится
+    из предыдущей) и качества.
+
+    Входит в имена копий, поэтому после смены параметров копии
+    записываются под новыми именами, а файл по старому адресу,
+    кешируемому без срока, не меняется.
+    """
+    parameters = repr((
+        sorted(settings.IMAGE_VARIANTS.items()), settings.IMAGE_QUALITY
+    ))
+    return hashlib.sha256(parameters.encode()).hexdigest()[:8]
+
+
+def get_variant_name(name, variant, extension):
+    """recipes/images/cake.png -> recipes/images/cake.thumb-<версия>.webp"""
+    return (
+        f'{posixpath.splitext(name)[0]}.{variant}-{get_variants_version()}'
+        f'.{extension}'
+    )
+
+
+def get_variant_urls(image, variants, build_url):
+    """Адреса копий или None, если копии еще не созданы для image."""
+    if not image or variants.get('source') != image.name:
+        return None
+
+    return {
+        variant: {
+            extension: build_url(image.storage.url(name))
+            for extension, name in files.items()
+        }
+        for variant, files in variants.items() if variant != 'source'
+    }
+
+
+def save_variant(storage, name, image, image_format):
+    if image_format == 'JPEG' and image.mode != 'RGB':
+        background = Image.new('RGB', image.size, 'white')
+        background.paste(image, mask=image.getchannel('A'))
+        image = background
+
+    buffer = io.BytesIO()
+    image.save(buffer, image_format, quality=settings.IMAGE_QUALITY)
+
+    # Существующий файл с этим именем построен из того же исходника
+    # с теми же параметрами и не перезаписывается.
+    return storage.save(name, ContentFile(buffer.getvalue()))
+
+
+def get_variant_names(name):
+    """Имена всех копий изображения name по размерам и форматам."""
+    return {
+        variant: {
+            extension: get_variant_name(name, variant, extension)
+            for extension, _ in FORMATS
+        } for variant in settings.IMAGE_VARIANTS
+    }
+
+
+def generate_variants(model_label, pk, field_name):
+    """Создание копий изображения и запись их имен в модель.
+
+    Копии строятся от большей к меньшей, каждая из предыдущей. Имена
+    сохраняются, только если изображение не сменилось за время обработки.
+    Изображение, загруженное до хранения по хешу содержимого, переносится
+    под адрес содержимого. Копии того же содержимого с теми же
+    параметрами, уже созданные для другой записи, используются повторно.
+    """
+    model = apps.get_model(model_label)
+    instance = model.objects.filter(pk=pk).first()
+    field_file = getattr(instance, field_name, None)
+
+    if not field_file:
+        return
+
+    name = source = field_file.name
+    storage = model._meta.get_field(field_name).storage
+    names = get_variant_names(name)
+
+    try:
+        if not ADDRESSED_NAME.search(name):
+            with storage.open(name) as file:
+                source = storage.save(name, file)
+            names = get_variant_names(source)
+
+        if not all(
+            storage.exists(variant_name)
+            for files in names.values() for variant_name in files.values()
+        ):
+            with storage.open(source) as file, Image.open(file) as image:
+                image = ImageOps.exif_transpose(image)
+                image = image.convert(
+                    'RGBA' if 'A' in image.getbands()
+                    or 'transparency' in image.info else 'RGB'
+                )
+
+                for variant, size in sorted(
+                    settings.IMAGE_VARIANTS.items(),
+                    key=lambda item: item[1],
+                    reverse=True
+                ):
+                    image.thumbnail(size, Image.Resampling.LANCZOS)
+                    names[variant] = {
+                        extension: save_variant(
+                            storage,
+                            names[variant][extension],
+                            image,
+                            image_format
+                        ) for extension, image_format in FORMATS
+                    }
+    except (OSError, UnidentifiedImageError, Image.DecompressionBombError):
+        logger.warning('Не удалось обработать изображение %s', name)
+        return
+
+    variants = {'source': source, **names}
+    variants_field = get_variants_field(field_name)
+    changes = {field_name: source, variants_field: variants}
+
+    if any(field.name == 'updated_at' for field in model._meta.fields):
+        # Копии входят в ответ, а дата изменения - в его ETag.
+        changes['updated_at'] = timezone.now()
+
+    if model.objects.filter(pk=pk, **{field_name: name}).update(**changes):
+        # Сигнал сохранения сбрасывает кеши ответов и аутентификации.
+        for field, value in changes.items():
+            setattr(instance, field, value)
+        post_save.send(
+            sender=model,
+            instance=instance,
+            created=False,
+            update_fields=frozenset(changes),
+            raw=False,
+            using=instance._state.db,
+        )
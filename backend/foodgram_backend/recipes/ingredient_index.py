@@ -0,0 +1,80 @@
+import threading
+import time
+from bisect import bisect_left
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import Ingredient
+
+VERSION_CACHE_KEY = 'ingredient_index_version'
+
+
+class IngredientIndex:
+    """Отсортированный по названию индекс ингредиентов в памяти процесса.
+
+    Отвечает на запросы автодополнения без обращения к базе: сначала
+    ингредиенты, название которых начинается с запроса, затем те, где
+    запрос встречается внутри названия. Индекс перестраивается, когда
+    меняется версия в кеше (см. invalidate) или истекает
+    INGREDIENT_INDEX_TTL секунд.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = ([], [])
+        self._version = None
+        self._built_at = None
+
+    def search(self, query):
+        self._ensure_fresh()
+        keys, ingredients = self._entries
+        query = query.strip().casefold()
+
+        if not query:
+            return list(ingredients)
+
+        start = bisect_left(keys, query)
+        end = bisect_left(keys, query + '\U0010ffff', start)
+
+        return ingredients[start:end] + [
+            ingredient for key, ingredient in zip(keys, ingredients)
+            if query in key and not key.startswith(query)
+        ]
+
+    def _ensure_fresh(self):
+        version = cache.get(VERSION_CACHE_KEY)
+        built_at = self._built_at
+
+        if (
+            built_at is not None
+            and version == self._version
+            and time.monotonic() - built_at < settings.INGREDIENT_INDEX_TTL
+        ):
+            return
+
+        with self._lock:
+            if self._built_at is built_at:
+                self._build(version)
+
+    def _build(self, version):
+        entries = sorted(
+            (ingredient.name.casefold(), ingredient.id, ingredient)
+            for ingredient in Ingredient.objects.order_by()
+        )
+        # Ключи и ингредиенты заменяются одним присваиванием, поэтому
+        # параллельные поиски видят либо старый, либо новый индекс.
+        self._entries = (
+            [key for key, _, _ in entries],
+            [ingredient for _, _, ingredient in entries],
+        )
+        self._version = version
+        self._built_at = time.monotonic()
+
+
+def invalidate():
+    """Сброс индекса во всех процессах, разделяющих кеш."""
+    cache.set(VERSION_CACHE_KEY, time.time_ns(), None)
+
+
+ingredient_index = IngredientIndex()
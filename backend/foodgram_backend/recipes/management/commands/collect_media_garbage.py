@@ -0,0 +1,205 @@
+import os
+import posixpath
+import shutil
+import time
+from functools import reduce
+from itertools import islice
+from operator import or_
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+
+from recipes.images import FORMATS, get_variants_field
+from recipes.models import Recipe
+
+User = get_user_model()
+
+BATCH_SIZE = 500
+
+# Модели и поля изображений, файлы которых лежат в каталогах upload_to.
+IMAGE_FIELDS = (
+    (Recipe, 'image'),
+    (User, 'avatar'),
+)
+
+
+def walk(path):
+    """Файлы каталога и подкаталогов без загрузки списка целиком."""
+    directories = [path]
+
+    while directories:
+        try:
+            entries = os.scandir(directories.pop())
+        except FileNotFoundError:
+            continue
+
+        with entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    directories.append(entry.path)
+                elif entry.is_file(follow_symlinks=False):
+                    yield entry
+
+
+def split_variant(name):
+    """Для имени копии cake.thumb-<версия>.webp (или cake.thumb.webp) -
+    начало имени исходника cake., для остальных файлов - None.
+    """
+    base, extension = posixpath.splitext(name)
+    base, variant = posixpath.splitext(base)
+
+    if (
+        variant[1:].partition('-')[0] in settings.IMAGE_VARIANTS
+        and extension[1:] in dict(FORMATS)
+    ):
+        return base + '.'
+
+    return None
+
+
+def find_referenced(model, field_name, names):
+    """Имена из names, на которые ссылаются записи model.
+
+    Исходники ищутся по полю изображения, копии - по списку копий
+    в записях, изображение которых начинается так же, как копия.
+    """
+    variants_field = get_variants_field(field_name)
+    prefixes = {split_variant(name) for name in names} - {None}
+    condition = Q(**{f'{field_name}__in': names})
+
+    if prefixes:
+        condition |= reduce(or_, (
+            Q(**{f'{field_name}__startswith': prefix}) for prefix in prefixes
+        ))
+
+    referenced = set()
+
+    for image, variants in model.objects.filter(condition).values_list(
+        field_name, variants_field
+    ):
+        referenced.add(image)
+        for variant, files in variants.items():
+            if variant != 'source':
+                referenced.update(files.values())
+
+    return referenced & set(names)
+
+
+class Command(BaseCommand):
+    help = (
+        'Поиск файлов изображений рецептов и аватаров, на которые не '
+        'ссылается ни одна запись, и их удаление или перенос в карантин.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только найти файлы и вывести отчет.'
+        )
+        parser.add_argument(
+            '--quarantine',
+            help=(
+                'Переносить файлы в этот каталог (вне MEDIA_ROOT) '
+                'с сохранением путей, а не удалять.'
+            )
+        )
+        parser.add_argument(
+            '--min-age', type=float, default=3600,
+            help=(
+                'Не трогать файлы моложе стольких секунд: загрузка могла '
+                'еще не зафиксировать запись в базе.'
+            )
+        )
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+        parser.add_argument(
+            '--verbose-files', action='store_true',
+            help='Выводить пути найденных файлов.'
+        )
+
+    def handle(self, *args, **options):
+        media_root = Path(settings.MEDIA_ROOT).resolve()
+        quarantine = options['quarantine'] and Path(
+            options['quarantine']
+        ).resolve()
+
+        if quarantine and media_root in (quarantine, *quarantine.parents):
+            raise CommandError('Карантин должен быть вне MEDIA_ROOT.')
+
+        self.options = options
+        self.quarantine = quarantine
+        self.media_root = media_root
+        self.stats = dict.fromkeys(
+            ('scanned', 'scanned_bytes', 'orphans', 'orphan_bytes', 'young'),
+            0
+        )
+        started = time.monotonic()
+
+        for model, field_name in IMAGE_FIELDS:
+            upload_to = model._meta.get_field(field_name).upload_to
+            files = walk(media_root / upload_to)
+
+            while batch := list(islice(files, options['batch_size'])):
+                self.process_batch(model, field_name, batch)
+
+        self.report(time.monotonic() - started)
+
+    def process_batch(self, model, field_name, entries):
+        deadline = time.time() - self.options['min_age']
+        candidates = {}
+
+        for entry in entries:
+            stat = entry.stat(follow_symlinks=False)
+            self.stats['scanned'] += 1
+            self.stats['scanned_bytes'] += stat.st_size
+
+            if stat.st_mtime > deadline:
+                self.stats['young'] += 1
+                continue
+
+            name = Path(entry.path).relative_to(self.media_root).as_posix()
+            candidates[name] = (entry.path, stat.st_size)
+
+        referenced = find_referenced(model, field_name, list(candidates))
+
+        for name, (path, size) in candidates.items():
+            if name in referenced:
+                continue
+
+            self.stats['orphans'] += 1
+            self.stats['orphan_bytes'] += size
+
+            if self.options['verbose_files']:
+                self.stdout.write(name)
+
+            if self.options['dry_run']:
+                continue
+
+            if self.quarantine:
+                target = self.quarantine / name
+                target.parent.mkdir(parents=True, exist_ok=True)
+                shutil.move(path, target)
+            else:
+                os.remove(path)
+
+    def report(self, elapsed):
+        stats = self.stats
+        action = (
+            'найдено' if self.options['dry_run']
+            else 'перенесено в карантин' if self.quarantine
+            else 'удалено'
+        )
+        elapsed = max(elapsed, 1e-6)
+
+        self.stdout.write(
+            f'Просмотрено файлов: {stats["scanned"]} '
+            f'({stats["scanned_bytes"] / 2 ** 20:.1f} МБ), '
+            f'пропущено новых: {stats["young"]}.\n'
+            f'Без ссылок {action}: {stats["orphans"]} '
+            f'({stats["orphan_bytes"] / 2 ** 20:.1f} МБ).\n'
+            f'Время: {elapsed:.1f} с, {stats["scanned"] / elapsed:.0f} '
+            f'файлов/с, {stats["scanned_bytes"] / 2 ** 20 / elapsed:.1f} '
+            'МБ/с.'
+        )
@@ -0,0 +1,327 @@
+import csv
+import io
+import json
+import random
+import time
+from datetime import timedelta
+from itertools import accumulate, islice
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import JSONField, Max
+from django.utils import timezone
+
+from api.cache import bump_table_version
+from recipes.models import (
+    Favorite,
+    Ingredient,
+    Recipe,
+    RecipeIngredient,
+    ShoppingCart,
+    encode_short_link,
+)
+from users.models import Subscription
+
+User = get_user_model()
+
+
+class ZipfSampler:
+    """Выбор индексов 0..n-1 с убывающей по закону Ципфа вероятностью."""
+
+    def __init__(self, rng, size, exponent):
+        self.rng = rng
+        self.population = range(size)
+        self.cum_weights = list(accumulate(
+            1 / (rank + 1) ** exponent for rank in range(size)
+        ))
+
+    def sample(self, k=1):
+        return self.rng.choices(
+            self.population, cum_weights=self.cum_weights, k=k
+        )
+
+    def unique_sample(self, k, exclude=None):
+        """До k различных индексов; популярные выпадают чаще."""
+        k = min(k, (len(self.population) - (exclude is not None)) // 2)
+        result = set()
+        for _ in range(20):
+            if len(result) >= k:
+                break
+            result.update(self.sample(k - len(result)))
+            result.discard(exclude)
+        # Хвост распределения добирается равномерной выборкой, чтобы не
+        # ждать редких индексов.
+        while len(result) < k:
+            result.add(self.rng.randrange(len(self.population)))
+            result.discard(exclude)
+        return result
+
+
+class RowWriter:
+    """Пакетная запись строк в таблицы модели.
+
+    На PostgreSQL используется COPY, на остальных базах - executemany
+    с многострочным INSERT. Значения полей берутся из экземпляров модели
+    как есть, поэтому заданные вручную id и даты сохраняются.
+    """
+
+    def __init__(self, batch_size):
+        self.batch_size = batch_size
+        self.use_copy = connection.vendor == 'postgresql'
+
+    def write(self, model, objects):
+        fields = model._meta.concrete_fields
+        columns = [field.column for field in fields]
+        table = model._meta.db_table
+        written = 0
+        iterator = iter(objects)
+
+        while batch := list(islice(iterator, self.batch_size)):
+            rows = [
+                [
+                    self.prepare(field, getattr(obj, field.attname))
+                    for field in fields
+                ] for obj in batch
+            ]
+            with transaction.atomic(), connection.cursor() as cursor:
+                if self.use_copy:
+                    self.copy(cursor, table, columns, rows)
+                else:
+                    cursor.executemany(
+                        'INSERT INTO {} ({}) VALUES ({})'.format(
+                            connection.ops.quote_name(table),
+                            ', '.join(map(connection.ops.quote_name, columns)),
+                            ', '.join(['%s'] * len(columns)),
+                        ),
+                        rows
+                    )
+            written += len(rows)
+
+        return written
+
+    def prepare(self, field, value):
+        if self.use_copy and isinstance(field, JSONField) and (
+            value is not None
+        ):
+            # get_db_prep_save возвращает адаптер Json, строка которого -
+            # SQL-литерал в кавычках, а COPY ждет сам текст JSON.
+            return json.dumps(value, cls=field.encoder)
+        return field.get_db_prep_save(value, connection)
+
+    def copy(self, cursor, table, columns, rows):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in rows:
+            writer.writerow('\\N' if value is None else value for value in row)
+        buffer.seek(0)
+        cursor.cursor.copy_expert(
+            'COPY {} ({}) FROM STDIN WITH (FORMAT csv, NULL \'\\N\')'.format(
+                connection.ops.quote_name(table),
+                ', '.join(map(connection.ops.quote_name, columns)),
+            ),
+            buffer
+        )
+
+
+class Command(BaseCommand):
+    help = (
+        'Генерация большого объема синтетических данных: пользователей, '
+        'рецептов с ингредиентами, избранного, списков покупок и подписок.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument(
+            '--scale', type=float, default=1.0,
+            help='Множитель для всех объемов данных.'
+        )
+        parser.add_argument('--users', type=int, default=10_000)
+        parser.add_argument('--recipes', type=int, default=100_000)
+        parser.add_argument(
+            '--favorites-per-user', type=float, default=50,
+            help='Среднее число рецептов в избранном у пользователя.'
+        )
+        parser.add_argument(
+            '--carts-per-user', type=float, default=50,
+            help='Среднее число рецептов в списке покупок у пользователя.'
+        )
+        parser.add_argument('--subscriptions-per-user', type=float, default=20)
+        parser.add_argument('--batch-size', type=int, default=10_000)
+        parser.add_argument(
+            '--ingredients-file',
+            default=settings.DATA_DIR / 'ingredients.csv',
+            help='CSV с ингредиентами, если таблица ингредиентов пуста.'
+        )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        self.rng = random.Random(options['seed'])
+        self.writer = RowWriter(options['batch_size'])
+        scale = options['scale']
+
+        ingredient_ids = self.get_ingredient_ids(options['ingredients_file'])
+        user_ids = self.create_users(max(2, int(options['users'] * scale)))
+        recipe_ids = self.create_recipes(
+            user_ids, max(1, int(options['recipes'] * scale))
+        )
+        self.create_recipe_ingredients(recipe_ids, ingredient_ids)
+        self.create_pairs(
+            Favorite, user_ids, recipe_ids, options['favorites_per_user']
+        )
+        self.create_pairs(
+            ShoppingCart, user_ids, recipe_ids, options['carts_per_user']
+        )
+        self.create_subscriptions(
+            user_ids, options['subscriptions_per_user']
+        )
+
+        models = [
+            User, Recipe, RecipeIngredient, Favorite, ShoppingCart,
+            Subscription
+        ]
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(no_style(), models):
+                cursor.execute(sql)
+
+        # Строки записаны в обход моделей, поэтому сигналы не сменили
+        # версии таблиц, от которых зависят кешированные ответы.
+        for model in models:
+            bump_table_version(model._meta.db_table)
+
+        call_command('rebuild_shopping_cart_totals', stdout=self.stdout)
+        call_command('reconcile_counters', stdout=self.stdout)
+        call_command('rebuild_feeds', stdout=self.stdout)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово за {time.monotonic() - started:.1f} с.'
+        ))
+
+    def report(self, model, count):
+        self.stdout.write(f'{model._meta.verbose_name_plural}: {count}')
+
+    def next_id(self, model):
+        return (model.objects.aggregate(Max('id'))['id__max'] or 0) + 1
+
+    def get_ingredient_ids(self, path):
+        if not Ingredient.objects.exists():
+            call_command('import_ingredients', path, stdout=self.stdout)
+
+        ingredient_ids = list(Ingredient.objects.values_list('id', flat=True))
+
+        if not ingredient_ids:
+            raise CommandError('Не удалось загрузить ингредиенты.')
+
+        self.rng.shuffle(ingredient_ids)
+        return ingredient_ids
+
+    def create_users(self, count):
+        first_id = self.next_id(User)
+        password = make_password('password')
+        now = timezone.now()
+
+        self.report(User, self.writer.write(User, (
+            User(
+                id=first_id + number,
+                email=f'user{first_id + number}@example.com',
+                username=f'user{first_id + number}',
+                first_name='Имя',
+                last_name=f'Фамилия {number}',
+                password=password,
+                date_joined=now,
+                is_active=True,
+            ) for number in range(count)
+        )))
+
+        return list(range(first_id, first_id + count))
+
+    def create_recipes(self, user_ids, count):
+        """Рецепты; небольшая доля авторов пишет большую часть рецептов."""
+        first_id = self.next_id(Recipe)
+        authors = ZipfSampler(self.rng, len(user_ids), 1.1)
+        now = timezone.now()
+
+        def generate():
+            for number in range(count):
+                pub_date = now - timedelta(
+                    seconds=self.rng.randint(0, 3 * 365 * 24 * 3600)
+                )
+                yield Recipe(
+                    id=first_id + number,
+                    author_id=user_ids[authors.sample()[0]],
+                    name=f'Рецепт {first_id + number}',
+                    short_link=encode_short_link(first_id + number),
+                    text='Описание рецепта. ' * self.rng.randint(3, 30),
+                    image='recipes/images/generated.png',
+                    cooking_time=int(self.rng.lognormvariate(3.4, 0.6)) + 1,
+                    pub_date=pub_date,
+                    updated_at=pub_date,
+                )
+
+        self.report(Recipe, self.writer.write(Recipe, generate()))
+
+        return list(range(first_id, first_id + count))
+
+    def create_recipe_ingredients(self, recipe_ids, ingredient_ids):
+        """От 3 до 15 ингредиентов, популярные встречаются чаще."""
+        ingredients = ZipfSampler(self.rng, len(ingredient_ids), 0.9)
+        first_id = self.next_id(RecipeIngredient)
+
+        def generate():
+            number = first_id
+            for recipe_id in recipe_ids:
+                size = round(self.rng.triangular(3, 15, 7))
+                for index in ingredients.unique_sample(size):
+                    yield RecipeIngredient(
+                        id=number,
+                        recipe_id=recipe_id,
+                        ingredient_id=ingredient_ids[index],
+                        amount=self.rng.randint(1, 1000),
+                    )
+                    number += 1
+
+        self.report(RecipeIngredient, self.writer.write(
+            RecipeIngredient, generate()
+        ))
+
+    def activity(self, mean):
+        """Число действий пользователя с тяжелым хвостом и заданным средним."""
+        return int(self.rng.paretovariate(2) * mean / 2)
+
+    def create_pairs(self, model, user_ids, recipe_ids, mean):
+        recipes = ZipfSampler(self.rng, len(recipe_ids), 0.8)
+        first_id = self.next_id(model)
+
+        def generate():
+            number = first_id
+            for user_id in user_ids:
+                for index in recipes.unique_sample(self.activity(mean)):
+                    yield model(
+                        id=number, user_id=user_id,
+                        recipe_id=recipe_ids[index]
+                    )
+                    number += 1
+
+        self.report(model, self.writer.write(model, generate()))
+
+    def create_subscriptions(self, user_ids, mean):
+        authors = ZipfSampler(self.rng, len(user_ids), 1.1)
+        first_id = self.next_id(Subscription)
+
+        def generate():
+            number = first_id
+            for position, user_id in enumerate(user_ids):
+                for index in authors.unique_sample(
+                    self.activity(mean), exclude=position
+                ):
+                    yield Subscription(
+                        id=number, user_id=user_id,
+                        following_id=user_ids[index]
+                    )
+                    number += 1
+
+        self.report(Subscription, self.writer.write(Subscription, generate()))
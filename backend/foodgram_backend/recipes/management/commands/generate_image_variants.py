@@ -0,0 +1,71 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from recipes.images import (
+    generate_variants,
+    get_variant_names,
+    get_variants_field,
+)
+from recipes.models import Recipe
+
+User = get_user_model()
+
+BATCH_SIZE = 1000
+
+IMAGE_FIELDS = (
+    (Recipe, 'image'),
+    (User, 'avatar'),
+)
+
+
+def process(model_label, pk, field_name):
+    try:
+        generate_variants(model_label, pk, field_name)
+    finally:
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = (
+        'Создание уменьшенных копий изображений рецептов и аватаров, '
+        'для которых их еще нет (например, изображений, загруженных до '
+        'появления копий или до смены IMAGE_VARIANTS и IMAGE_QUALITY). '
+        'Изображения, загруженные до хранения по хешу содержимого, при '
+        'этом переносятся под адрес содержимого.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all', action='store_true',
+            help=(
+                'Обработать все изображения, даже с записанными копиями. '
+                'Готовые файлы копий не перезаписываются.'
+            )
+        )
+        parser.add_argument(
+            '--workers', type=int, default=settings.TASKS_WORKERS
+        )
+
+    def handle(self, *args, **options):
+        with ThreadPoolExecutor(options['workers']) as executor:
+            for model, field_name in IMAGE_FIELDS:
+                pks = [
+                    pk for pk, name, variants in model.objects.exclude(
+                        **{field_name: ''}
+                    ).values_list(
+                        'pk', field_name, get_variants_field(field_name)
+                    ).iterator(chunk_size=BATCH_SIZE)
+                    if options['all']
+                    or variants != {'source': name, **get_variant_names(name)}
+                ]
+                list(executor.map(
+                    lambda pk: process(model._meta.label, pk, field_name),
+                    pks
+                ))
+                self.stdout.write(
+                    f'{model._meta.verbose_name_plural}: {len(pks)}'
+                )
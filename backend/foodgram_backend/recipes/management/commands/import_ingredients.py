@@ -0,0 +1,156 @@
+import csv
+import json
+from itertools import islice
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from api.cache import bump_table_version
+from recipes import ingredient_index
+from recipes.models import Ingredient
+
+JSON_CHUNK_SIZE = 64 * 1024
+
+
+def read_csv(file):
+    for row in csv.reader(file):
+        if len(row) >= 2:
+            yield row[0], row[1]
+
+
+def read_json(file):
+    """Потоковое чтение JSON-массива объектов без загрузки файла целиком."""
+    decoder = json.JSONDecoder()
+    buffer = ''
+    started = False
+
+    while True:
+        chunk = file.read(JSON_CHUNK_SIZE)
+        buffer += chunk
+        position = 0
+
+        while True:
+            while position < len(buffer) and buffer[position] in ' \t\r\n,':
+                position += 1
+
+            if not started:
+                if position == len(buffer):
+                    break
+                if buffer[position] != '[':
+                    raise CommandError('Ожидается JSON-массив ингредиентов.')
+                started = True
+                position += 1
+                continue
+
+            if position < len(buffer) and buffer[position] == ']':
+                return
+
+            try:
+                item, position = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                if not chunk:
+                    raise CommandError('Некорректный JSON.')
+                break
+
+            yield item['name'], item['measurement_unit']
+
+        buffer = buffer[position:]
+
+        if not chunk:
+            return
+
+
+READERS = {
+    'csv': read_csv,
+    'json': read_json,
+}
+
+
+def invalidate_caches():
+    """Сброс индекса автодополнения и закешированных ответов API."""
+    ingredient_index.invalidate()
+    bump_table_version(Ingredient._meta.db_table)
+
+
+def normalize(value):
+    return ' '.join(value.split())
+
+
+class Command(BaseCommand):
+    help = (
+        'Импорт ингредиентов из CSV или JSON. Повторный запуск не создает '
+        'дубликатов: ключом служит пара (название, единица измерения).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', nargs='?',
+            default=settings.DATA_DIR / 'ingredients.csv',
+        )
+        parser.add_argument(
+            '--format', choices=READERS,
+            help='Формат файла; по умолчанию определяется по расширению.'
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        path = Path(options['path'])
+        file_format = options['format'] or path.suffix.lstrip('.').lower()
+
+        if file_format not in READERS:
+            raise CommandError(f'Неизвестный формат файла: {path.name}')
+
+        existing = {
+            (name.casefold(), unit.casefold()): (pk, name, unit)
+            for pk, name, unit in Ingredient.objects.values_list(
+                'id', 'name', 'measurement_unit'
+            )
+        }
+        seen = set()
+        inserted = updated = skipped = 0
+
+        with open(path, encoding='utf-8') as file, transaction.atomic():
+            rows = READERS[file_format](file)
+
+            while batch := list(islice(rows, options['batch_size'])):
+                to_create = []
+                to_update = []
+
+                for name, unit in batch:
+                    name, unit = normalize(name), normalize(unit)
+                    key = (name.casefold(), unit.casefold())
+
+                    if not name or key in seen:
+                        skipped += 1
+                        continue
+                    seen.add(key)
+
+                    if key not in existing:
+                        to_create.append(
+                            Ingredient(name=name, measurement_unit=unit)
+                        )
+                    elif existing[key][1:] != (name, unit):
+                        to_update.append(Ingredient(
+                            id=existing[key][0],
+                            name=name,
+                            measurement_unit=unit
+                        ))
+                    else:
+                        skipped += 1
+
+                Ingredient.objects.bulk_create(to_create)
+                Ingredient.objects.bulk_update(
+                    to_update, ('name', 'measurement_unit')
+                )
+                inserted += len(to_create)
+                updated += len(to_update)
+
+            if inserted or updated:
+                transaction.on_commit(invalidate_caches)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Добавлено: {inserted}, обновлено: {updated}, '
+            f'пропущено: {skipped}.'
+        ))
@@ -0,0 +1,76 @@
+from itertools import groupby, islice
+from operator import itemgetter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from recipes.models import FeedEntry, Recipe
+from users.models import Subscription
+
+BATCH_SIZE = 5000
+
+
+def latest_recipes():
+    """Последние рецепты каждого автора по возрастанию id автора."""
+    rows = Recipe.objects.order_by(
+        'author_id', '-pub_date', '-id'
+    ).values_list('author_id', 'id', 'pub_date').iterator(
+        chunk_size=BATCH_SIZE
+    )
+    for author_id, group in groupby(rows, key=itemgetter(0)):
+        yield author_id, list(islice(group, settings.FEED_BACKFILL_SIZE))
+
+
+def feed_entries():
+    """Слияние подписок и последних рецептов по id автора."""
+    subscriptions = Subscription.objects.order_by(
+        'following_id'
+    ).values_list('following_id', 'user_id').iterator(chunk_size=BATCH_SIZE)
+    recipes = latest_recipes()
+    current = next(recipes, None)
+
+    for author_id, group in groupby(subscriptions, key=itemgetter(0)):
+        while current is not None and current[0] < author_id:
+            current = next(recipes, None)
+
+        if current is None:
+            return
+
+        if current[0] != author_id:
+            continue
+
+        for _, user_id in group:
+            for _, recipe_id, pub_date in current[1]:
+                yield FeedEntry(
+                    user_id=user_id,
+                    recipe_id=recipe_id,
+                    author_id=author_id,
+                    pub_date=pub_date,
+                )
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересоздание лент подписок: в ленту каждого подписчика '
+        'записываются последние FEED_BACKFILL_SIZE рецептов автора.'
+    )
+
+    def handle(self, *args, **options):
+        created = 0
+        now = timezone.now()
+
+        with transaction.atomic():
+            FeedEntry.objects.all().delete()
+            entries = feed_entries()
+
+            while batch := list(islice(entries, BATCH_SIZE)):
+                created += len(FeedEntry.objects.bulk_create(batch))
+
+            Subscription.objects.update(feed_synced_at=now)
+            FeedEntry.objects.bump_version()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано записей лент: {created}.'
+        ))
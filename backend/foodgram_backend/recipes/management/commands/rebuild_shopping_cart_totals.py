@@ -0,0 +1,101 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Sum
+
+from recipes.models import RecipeIngredient, ShoppingCartTotal
+
+BATCH_SIZE = 5000
+
+
+def expected_totals():
+    """Итоги, посчитанные заново по корзинам, по возрастанию ключа."""
+    return (
+        (
+            (row['recipe__added_in_shopping_cart_by__user'],
+             row['ingredient']),
+            row['total'],
+        ) for row in RecipeIngredient.objects.filter(
+            recipe__added_in_shopping_cart_by__isnull=False
+        ).values(
+            'recipe__added_in_shopping_cart_by__user', 'ingredient'
+        ).annotate(total=Sum('amount')).order_by(
+            'recipe__added_in_shopping_cart_by__user_id', 'ingredient_id'
+        ).iterator(chunk_size=BATCH_SIZE)
+    )
+
+
+def stored_totals():
+    return (
+        ((user_id, ingredient_id), amount)
+        for user_id, ingredient_id, amount in ShoppingCartTotal.objects
+        .order_by('user_id', 'ingredient_id')
+        .values_list('user_id', 'ingredient_id', 'amount')
+        .iterator(chunk_size=BATCH_SIZE)
+    )
+
+
+def compare(expected, stored):
+    """Слияние двух упорядоченных потоков; возвращает расхождения
+    в виде (ключ, ожидаемое количество, сохраненное количество).
+    """
+    sentinel = (None, None)
+    expected_item = next(expected, sentinel)
+    stored_item = next(stored, sentinel)
+
+    while expected_item is not sentinel or stored_item is not sentinel:
+        if stored_item is sentinel or (
+            expected_item is not sentinel
+            and expected_item[0] < stored_item[0]
+        ):
+            yield expected_item[0], expected_item[1], None
+            expected_item = next(expected, sentinel)
+        elif expected_item is sentinel or stored_item[0] < expected_item[0]:
+            yield stored_item[0], None, stored_item[1]
+            stored_item = next(stored, sentinel)
+        else:
+            if expected_item[1] != stored_item[1]:
+                yield expected_item[0], expected_item[1], stored_item[1]
+            expected_item = next(expected, sentinel)
+            stored_item = next(stored, sentinel)
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчет итогов списков покупок по содержимому корзин. '
+        'С параметром --check только сообщает о расхождениях.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true')
+
+    def handle(self, *args, **options):
+        if options['check']:
+            mismatches = 0
+            for key, expected, stored in compare(
+                expected_totals(), stored_totals()
+            ):
+                mismatches += 1
+                self.stdout.write(
+                    f'user={key[0]} ingredient={key[1]}: '
+                    f'ожидается {expected}, сохранено {stored}'
+                )
+            self.stdout.write(f'Расхождений: {mismatches}.')
+            return
+
+        created = 0
+        with transaction.atomic():
+            ShoppingCartTotal.objects.all().delete()
+            batch = []
+            for (user_id, ingredient_id), amount in expected_totals():
+                batch.append(ShoppingCartTotal(
+                    user_id=user_id, ingredient_id=ingredient_id,
+                    amount=amount
+                ))
+                if len(batch) >= BATCH_SIZE:
+                    created += len(ShoppingCartTotal.objects.bulk_create(
+                        batch
+                    ))
+                    batch = []
+            created += len(ShoppingCartTotal.objects.bulk_create(batch))
+
+        self.stdout.write(self.style.SUCCESS(f'Создано итогов: {created}.'))
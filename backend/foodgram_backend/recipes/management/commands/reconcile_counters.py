@@ -0,0 +1,62 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db.models import Count, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from recipes.models import Favorite, Recipe
+from users.models import Subscription
+
+User = get_user_model()
+
+
+def count_subquery(model, field):
+    """Фактическое число связанных записей для строки внешнего запроса."""
+    return Coalesce(
+        Subquery(
+            model.objects.filter(**{field: OuterRef('pk')}).order_by().values(
+                field
+            ).annotate(total=Count('pk')).values('total')
+        ),
+        0
+    )
+
+
+# Модель, денормализованный счетчик и выражение с фактическим значением.
+COUNTERS = (
+    (Recipe, 'favorites_count', lambda: count_subquery(Favorite, 'recipe')),
+    (User, 'recipes_count', lambda: count_subquery(Recipe, 'author')),
+    (
+        User, 'subscribers_count',
+        lambda: count_subquery(Subscription, 'following')
+    ),
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Исправление расхождений денормализованных счетчиков '
+        '(число добавлений рецепта в избранное, число рецептов '
+        'и подписчиков автора). '
+        'С параметром --check только сообщает о расхождениях.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true')
+
+    def handle(self, *args, **options):
+        for model, field, actual in COUNTERS:
+            drifted = model.objects.filter(~Q(**{field: actual()}))
+            if options['check']:
+                result = drifted.count()
+            else:
+                changes = {field: actual()}
+                if model is Recipe:
+                    # Счетчик входит в ответ, а дата изменения - в его ETag.
+                    changes['updated_at'] = timezone.now()
+                result = drifted.update(**changes)
+
+            self.stdout.write(
+                f'{model.__name__}.{field}: расхождений {result}'
+                + ('' if options['check'] else ', исправлено')
+            )
@@ -0,0 +1,56 @@
+# Generated by Django 4.2.21 on 2026-10-17 04:22
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_totals(apps, schema_editor):
+    RecipeIngredient = apps.get_model('recipes', 'RecipeIngredient')
+    ShoppingCartTotal = apps.get_model('recipes', 'ShoppingCartTotal')
+
+    totals = RecipeIngredient.objects.filter(
+        recipe__added_in_shopping_cart_by__isnull=False
+    ).values(
+        'recipe__added_in_shopping_cart_by__user', 'ingredient'
+    ).annotate(total=models.Sum('amount')).order_by()
+
+    ShoppingCartTotal.objects.bulk_create(
+        (
+            ShoppingCartTotal(
+                user_id=total['recipe__added_in_shopping_cart_by__user'],
+                ingredient_id=total['ingredient'],
+                amount=total['total'],
+            ) for total in totals.iterator()
+        ),
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('recipes', '0004_ingredient_search_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShoppingCartTotal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.IntegerField(default=0)),
+                ('ingredient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shopping_cart_totals', to='recipes.ingredient')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shopping_cart_totals', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Итог списка покупок',
+                'verbose_name_plural': 'Итоги списков покупок',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='shoppingcarttotal',
+            constraint=models.UniqueConstraint(fields=('user', 'ingredient'), name='unique_shopping_cart_total'),
+        ),
+        migrations.RunPython(fill_totals, migrations.RunPython.noop),
+    ]
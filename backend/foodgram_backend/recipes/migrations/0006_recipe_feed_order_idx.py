@@ -0,0 +1,17 @@
+# Generated by Django 4.2.21 on 2026-10-17 05:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0005_shoppingcarttotal'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['-pub_date', 'name', 'id'], name='recipe_feed_order_idx'),
+        ),
+    ]
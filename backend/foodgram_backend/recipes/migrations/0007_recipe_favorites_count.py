@@ -0,0 +1,45 @@
+# Generated by Django 4.2.21 on 2026-10-17 05:20
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def count_subquery(model, field):
+    return Coalesce(
+        models.Subquery(
+            model.objects.filter(
+                **{field: models.OuterRef('pk')}
+            ).order_by().values(field).annotate(
+                total=models.Count('pk')
+            ).values('total')
+        ),
+        0
+    )
+
+
+def fill_counters(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    Favorite = apps.get_model('recipes', 'Favorite')
+    User = apps.get_model('users', 'CustomUser')
+
+    Recipe.objects.update(
+        favorites_count=count_subquery(Favorite, 'recipe')
+    )
+    User.objects.update(recipes_count=count_subquery(Recipe, 'author'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0006_recipe_feed_order_idx'),
+        ('users', '0006_customuser_recipes_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='favorites_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Число добавлений в избранное'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 4.2.21 on 2026-10-17 06:31
+
+import string
+
+from django.db import migrations
+
+ALPHABET = string.digits + string.ascii_letters
+BATCH_SIZE = 1000
+
+
+def encode(number):
+    code = ''
+    while True:
+        number, digit = divmod(number, len(ALPHABET))
+        code = ALPHABET[digit] + code
+        if not number:
+            return code
+
+
+def fill_short_links(apps, schema_editor):
+    """Коды для рецептов без короткой ссылки.
+
+    Уже выданные ссылки (восемь шестнадцатеричных символов) остаются
+    прежними и не пересекаются с новыми кодами, которые короче.
+    """
+    Recipe = apps.get_model('recipes', 'Recipe')
+    recipes = Recipe.objects.filter(short_link__isnull=True).only('id')
+
+    while batch := list(recipes[:BATCH_SIZE]):
+        for recipe in batch:
+            recipe.short_link = encode(recipe.id)
+        Recipe.objects.bulk_update(batch, ('short_link',))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0009_feedentry'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_short_links, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 4.2.21 on 2026-10-17 13:05
+
+import foodgram_backend.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0013_alter_recipe_image'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='recipe',
+            name='image',
+            field=models.ImageField(db_index=True, storage=foodgram_backend.storage.ContentAddressedStorage(), upload_to='recipes/images/'),
+        ),
+    ]
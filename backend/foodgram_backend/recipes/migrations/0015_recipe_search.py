@@ -0,0 +1,85 @@
+# Generated by Django 4.2.21 on 2026-10-17 14:10
+
+from django.db import migrations
+
+# Полнотекстовый поиск рецептов (recipes.search). Столбец и таблица
+# поиска обновляются триггерами только при изменении названия или
+# описания, а не при обновлении счетчиков рецепта. На SQLite триггеры
+# удаляются вместе с таблицей, если миграция пересоздает recipes_recipe;
+# их восстанавливает обработчик post_migrate (recipes.search).
+POSTGRESQL_CREATE = (
+    'ALTER TABLE recipes_recipe ADD COLUMN search_vector tsvector',
+    """
+    CREATE FUNCTION recipes_recipe_search_vector() RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector :=
+            setweight(to_tsvector('russian', coalesce(NEW.name, '')), 'A')
+            || setweight(to_tsvector('russian', coalesce(NEW.text, '')), 'B');
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    'CREATE TRIGGER recipes_recipe_search_vector_trg '
+    'BEFORE INSERT OR UPDATE OF name, text ON recipes_recipe '
+    'FOR EACH ROW EXECUTE FUNCTION recipes_recipe_search_vector()',
+    'UPDATE recipes_recipe SET name = name',
+    'CREATE INDEX recipes_recipe_search_idx '
+    'ON recipes_recipe USING gin (search_vector)',
+)
+POSTGRESQL_DROP = (
+    'DROP TRIGGER IF EXISTS recipes_recipe_search_vector_trg '
+    'ON recipes_recipe',
+    'DROP FUNCTION IF EXISTS recipes_recipe_search_vector()',
+    'ALTER TABLE recipes_recipe DROP COLUMN IF EXISTS search_vector',
+)
+SQLITE_CREATE = (
+    "CREATE VIRTUAL TABLE recipes_recipe_fts USING fts5("
+    "name, text, content='recipes_recipe', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2')",
+    'CREATE TRIGGER recipes_recipe_fts_insert AFTER INSERT ON recipes_recipe '
+    'BEGIN INSERT INTO recipes_recipe_fts(rowid, name, text) '
+    'VALUES (new.id, new.name, new.text); END',
+    'CREATE TRIGGER recipes_recipe_fts_delete AFTER DELETE ON recipes_recipe '
+    "BEGIN INSERT INTO recipes_recipe_fts(recipes_recipe_fts, rowid, name, "
+    "text) VALUES ('delete', old.id, old.name, old.text); END",
+    'CREATE TRIGGER recipes_recipe_fts_update '
+    'AFTER UPDATE OF name, text ON recipes_recipe '
+    "BEGIN INSERT INTO recipes_recipe_fts(recipes_recipe_fts, rowid, name, "
+    "text) VALUES ('delete', old.id, old.name, old.text); "
+    'INSERT INTO recipes_recipe_fts(rowid, name, text) '
+    'VALUES (new.id, new.name, new.text); END',
+    "INSERT INTO recipes_recipe_fts(recipes_recipe_fts) VALUES ('rebuild')",
+)
+SQLITE_DROP = (
+    'DROP TRIGGER IF EXISTS recipes_recipe_fts_update',
+    'DROP TRIGGER IF EXISTS recipes_recipe_fts_delete',
+    'DROP TRIGGER IF EXISTS recipes_recipe_fts_insert',
+    'DROP TABLE IF EXISTS recipes_recipe_fts',
+)
+
+
+def run_on_vendor(statements):
+    def operation(apps, schema_editor):
+        for statement in statements.get(schema_editor.connection.vendor, ()):
+            schema_editor.execute(statement)
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0014_alter_recipe_image'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run_on_vendor({
+                'postgresql': POSTGRESQL_CREATE,
+                'sqlite': SQLITE_CREATE,
+            }),
+            run_on_vendor({
+                'postgresql': POSTGRESQL_DROP,
+                'sqlite': SQLITE_DROP,
+            }),
+        ),
+    ]
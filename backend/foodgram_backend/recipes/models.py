@@ -1,13 +1,36 @@
-import hashlib
+import string
+from datetime import timedelta
+from itertools import islice
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.validators import MaxValueValidator, MinValueValidator
-from django.db import models
+from django.db import models, transaction
+from django.utils import timezone
 
+from api.cache import bump_table_version
 from constants import RecipeConstants
+from foodgram_backend.storage import image_storage
+from users.models import Subscription
 
 
 User = get_user_model()
 
+SHORT_LINK_ALPHABET = string.digits + string.ascii_letters
+
+
+def encode_short_link(number):
+    """Код короткой ссылки: id рецепта в системе счисления с основанием 62.
+
+    Разные id дают разные коды, поэтому проверять коллизии не нужно.
+    """
+    code = ''
+    while True:
+        number, digit = divmod(number, len(SHORT_LINK_ALPHABET))
+        code = SHORT_LINK_ALPHABET[digit] + code
+        if not number:
+            return code
+
 
 class Ingredient(models.Model):
     """Инридиент."""
@@ -39,7 +62,18 @@ class Recipe(models.Model):
         related_name='recipes'
     )
     name = models.CharField(max_length=256)
-    image = models.ImageField(upload_to='recipes/images/')
+    # Индекс нужен поиску файлов без ссылок (collect_media_garbage).
+    image = models.ImageField(
+        upload_to='recipes/images/',
+        storage=image_storage,
+        db_index=True
+    )
+    image_variants = models.JSONField(
+        default=dict,
+        blank=True,
+        editable=False,
+        verbose_name='Уменьшенные копии изображения'
+    )
     text = models.TextField()
     cooking_time = models.PositiveSmallIntegerField(
         validators=[
@@ -53,7 +87,16 @@ class Recipe(models.Model):
         related_name='recipes'
     )
     pub_date = models.DateTimeField(auto_now_add=True)
-    short_link = short_link = models.CharField(
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Дата изменения'
+    )
+    favorites_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Число добавлений в избранное'
+    )
+    short_link = models.CharField(
         max_length=10,
         unique=True,
         blank=True,
@@ -64,19 +107,31 @@ class Recipe(models.Model):
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
         ordering = ('-pub_date', 'name')
+        indexes = [
+            models.Index(
+                fields=['-pub_date', 'name', 'id'],
+                name='recipe_feed_order_idx'
+            ),
+            models.Index(
+                fields=['author', '-pub_date'],
+                name='recipe_author_pub_date_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.name
 
-    def create_short_link(self):
-        """Создание короткой ссылки с помощью хеширования id и name."""
-        base_str = f"{self.id}{self.name}"
-        hash_object = hashlib.md5(base_str.encode())
-        hex_dig = hash_object.hexdigest()
+    def save(self, *args, **kwargs):
+        """Сохранение рецепта; код короткой ссылки назначается один раз,
+        когда после первой записи становится известен id.
+        """
+        super().save(*args, **kwargs)
 
-        self.short_link = hex_dig[:8]
-        self.save()
-        return self.short_link
+        if not self.short_link:
+            self.short_link = encode_short_link(self.id)
+            Recipe.objects.filter(pk=self.pk).update(
+                short_link=self.short_link
+            )
 
 
 class RecipeIngredient(models.Model):
@@ -117,6 +172,15 @@ class RecipeIngredient(models.Model):
     def __str__(self):
         return f'{self.ingredient} в {self.recipe}'
 
+    @classmethod
+    def get_amounts(cls, recipe_id):
+        """Количества ингредиентов рецепта в виде {ingredient_id: amount}."""
+        return dict(
+            cls.objects.filter(recipe_id=recipe_id).order_by().values_list(
+                'ingredient_id', 'amount'
+            )
+        )
+
 
 class Favorite(models.Model):
     """Избранное."""
@@ -180,3 +244,278 @@ class ShoppingCart(models.Model):
 
     def __str__(self):
         return f'{self.recipe} в списке покупок у {self.user}'
+
+
+class ShoppingCartTotalManager(models.Manager):
+    """Инкрементальное обновление итогов списка покупок."""
+
+    def apply(self, user_ids, amounts, sign=1):
+        """Прибавление (sign=1) или вычитание (sign=-1) количеств
+        ингредиентов {ingredient_id: amount} в итогах пользователей.
+        """
+        user_ids = list(user_ids)
+
+        if not user_ids or not amounts:
+            return
+
+        with transaction.atomic():
+            self._apply(user_ids, amounts, sign)
+
+    def _apply(self, user_ids, amounts, sign):
+        self.bulk_create(
+            [
+                self.model(user_id=user_id, ingredient_id=ingredient_id)
+                for user_id in user_ids for ingredient_id in amounts
+            ],
+            ignore_conflicts=True
+        )
+        totals = self.filter(
+            user_id__in=user_ids, ingredient_id__in=amounts
+        )
+        totals.update(amount=models.F('amount') + models.Case(
+            *(
+                models.When(
+                    ingredient_id=ingredient_id, then=sign * amount
+                ) for ingredient_id, amount in amounts.items()
+            ),
+            default=0,
+        ))
+        if any(sign * amount < 0 for amount in amounts.values()):
+            totals.filter(amount__lte=0).delete()
+
+    def add_recipe(self, user_id, recipe_id, sign=1):
+        self.apply((user_id,), RecipeIngredient.get_amounts(recipe_id), sign)
+
+    def remove_recipe(self, user_id, recipe_id):
+        self.add_recipe(user_id, recipe_id, sign=-1)
+
+    def change_recipe(self, recipe_id, old_amounts, new_amounts):
+        """Учет изменения ингредиентов рецепта у всех, у кого он в корзине."""
+        deltas = {
+            ingredient_id: new_amounts.get(ingredient_id, 0)
+            - old_amounts.get(ingredient_id, 0)
+            for ingredient_id in old_amounts.keys() | new_amounts.keys()
+        }
+        deltas = {
+            ingredient_id: delta
+            for ingredient_id, delta in deltas.items() if delta
+        }
+
+        if deltas:
+            self.apply(
+                ShoppingCart.objects.filter(
+                    recipe_id=recipe_id
+                ).values_list('user_id', flat=True),
+                deltas
+            )
+
+
+class ShoppingCartTotal(models.Model):
+    """Суммарное количество ингредиента в списке покупок пользователя.
+
+    Обновляется при добавлении и удалении рецептов из корзины и при
+    изменении ингредиентов рецепта, поэтому выгрузка списка покупок
+    читает готовые итоги.
+    """
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='shopping_cart_totals'
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        related_name='shopping_cart_totals'
+    )
+    amount = models.IntegerField(default=0)
+
+    objects = ShoppingCartTotalManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'ingredient'],
+                name='unique_shopping_cart_total'
+            )
+        ]
+        verbose_name = 'Итог списка покупок'
+        verbose_name_plural = 'Итоги списков покупок'
+
+    def __str__(self):
+        return f'{self.ingredient} - {self.amount} у {self.user}'
+
+
+class FeedEntryManager(models.Manager):
+    """Наполнение ленты подписок.
+
+    Рецепт автора, у которого не больше FEED_FANOUT_MAX_SUBSCRIBERS
+    подписчиков, после публикации записывается в ленты всех подписчиков
+    фоновой задачей (recipes.tasks.fan_out_recipe).
+    Рецепты более популярных авторов в ленту подписчика дописываются
+    при ее чтении (pull), начиная с момента прошлого чтения.
+    Записи создаются и удаляются пачками, без сигналов, поэтому версию
+    таблицы для кеша COUNT ленты методы меняют сами.
+    """
+
+    batch_size = 1000
+    pull_overlap = timedelta(minutes=1)
+
+    def is_fan_out_author(self, author_id):
+        subscribers_count = User.objects.filter(pk=author_id).values_list(
+            'subscribers_count', flat=True
+        ).first()
+        return (
+            subscribers_count is not None
+            and subscribers_count <= settings.FEED_FANOUT_MAX_SUBSCRIBERS
+        )
+
+    def fan_out(self, recipes):
+        """Запись рецептов одного автора в ленты его подписчиков."""
+        recipes = list(recipes)
+
+        if not recipes:
+            return
+
+        user_ids = Subscription.objects.filter(
+            following_id=recipes[0].author_id
+        ).values_list('user_id', flat=True).iterator(
+            chunk_size=self.batch_size
+        )
+
+        while batch := list(islice(user_ids, self.batch_size)):
+            self.bulk_create(
+                [
+                    self.model(
+                        user_id=user_id,
+                        recipe_id=recipe.id,
+                        author_id=recipe.author_id,
+                        pub_date=recipe.pub_date,
+                    ) for user_id in batch for recipe in recipes
+                ],
+                ignore_conflicts=True
+            )
+
+        self.bump_version()
+
+    def backfill(self, user_id, author_id):
+        """Последние рецепты автора в ленте нового подписчика."""
+        self.bulk_create(
+            [
+                self.model(
+                    user_id=user_id,
+                    recipe_id=recipe_id,
+                    author_id=author_id,
+                    pub_date=pub_date,
+                ) for recipe_id, pub_date in Recipe.objects.filter(
+                    author_id=author_id
+                ).order_by('-pub_date', '-id').values_list(
+                    'id', 'pub_date'
+                )[:settings.FEED_BACKFILL_SIZE]
+            ],
+            ignore_conflicts=True
+        )
+        self.bump_version()
+
+    def prune(self, user_id, author_id):
+        self.filter(user_id=user_id, author_id=author_id).delete()
+        self.bump_version()
+
+    def bump_version(self):
+        bump_table_version(self.model._meta.db_table, self.db)
+
+    def pull(self, user):
+        """Дописывание в ленту новых рецептов популярных авторов.
+
+        Окно pull_overlap перекрывает прошлое чтение, чтобы не потерять
+        рецепты, транзакция которых завершилась позже их pub_date.
+        """
+        subscriptions = list(user.followers.filter(
+            following__subscribers_count__gt=(
+                settings.FEED_FANOUT_MAX_SUBSCRIBERS
+            )
+        ).values_list('id', 'following_id', 'feed_synced_at'))
+
+        if not subscriptions:
+            return
+
+        now = timezone.now()
+        condition = models.Q(pk__in=[])
+
+        for _, author_id, synced_at in subscriptions:
+            if synced_at is None:
+                self.backfill(user.id, author_id)
+            else:
+                condition |= models.Q(
+                    author_id=author_id,
+                    pub_date__gt=synced_at - self.pull_overlap
+                )
+
+        # Повторная выборка безопасна: ignore_conflicts пропускает рецепты,
+        # уже записанные в ленту.
+        self.bulk_create(
+            [
+                self.model(
+                    user=user,
+                    recipe_id=recipe_id,
+                    author_id=author_id,
+                    pub_date=pub_date,
+                ) for recipe_id, author_id, pub_date in Recipe.objects
+                .filter(condition)
+                .values_list('id', 'author_id', 'pub_date')
+            ],
+            ignore_conflicts=True
+        )
+        Subscription.objects.filter(
+            id__in=[subscription[0] for subscription in subscriptions]
+        ).update(feed_synced_at=now)
+        self.bump_version()
+
+
+class FeedEntry(models.Model):
+    """Рецепт в ленте подписок пользователя.
+
+    Лента читается одним проходом по индексу (user, -pub_date, -recipe).
+    """
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed_entries'
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='feed_entries'
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+    pub_date = models.DateTimeField()
+
+    objects = FeedEntryManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'recipe'],
+                name='unique_feed_entry'
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-recipe'],
+                name='feed_entry_page_idx'
+            ),
+            models.Index(
+                fields=['user', 'author'],
+                name='feed_entry_author_idx'
+            ),
+        ]
+        verbose_name = 'Запись ленты подписок'
+        verbose_name_plural = 'Записи лент подписок'
+
+    def __str__(self):
+        return f'{self.recipe} в ленте у {self.user}'
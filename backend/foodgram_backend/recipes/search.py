@@ -0,0 +1,134 @@
+"""Полнотекстовый поиск рецептов по названию и описанию.
+
+На PostgreSQL используется столбец search_vector типа tsvector
+с GIN-индексом, на SQLite - таблица FTS5 recipes_recipe_fts с внешним
+содержимым. Оба заполняются триггерами базы (миграция 0015_recipe_search)
+при изменении названия или описания, поэтому остаются актуальными
+при любом сохранении рецепта. Совпадение в названии весит больше, чем
+в описании.
+
+На SQLite триггеры удаляются вместе с таблицей, когда миграция
+пересоздает recipes_recipe (например, при AlterField), поэтому после
+каждой миграции restore_sqlite_triggers восстанавливает недостающие.
+"""
+import re
+
+from django.contrib.postgres.search import (
+    SearchQuery,
+    SearchRank,
+    SearchVectorField,
+)
+from django.db import connections
+from django.db.models import F, FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+
+# Конфигурация текстового поиска PostgreSQL, та же, что в триггере.
+SEARCH_CONFIG = 'russian'
+
+# Веса столбцов name и text для bm25 на SQLite.
+FTS_WEIGHTS = (10.0, 1.0)
+
+NO_RANK = Value(0.0, output_field=FloatField())
+
+# Триггеры таблицы FTS5 на SQLite, те же, что в миграции 0015.
+SQLITE_TRIGGERS = {
+    'recipes_recipe_fts_insert': (
+        'CREATE TRIGGER recipes_recipe_fts_insert '
+        'AFTER INSERT ON recipes_recipe '
+        'BEGIN INSERT INTO recipes_recipe_fts(rowid, name, text) '
+        'VALUES (new.id, new.name, new.text); END'
+    ),
+    'recipes_recipe_fts_delete': (
+        'CREATE TRIGGER recipes_recipe_fts_delete '
+        'AFTER DELETE ON recipes_recipe '
+        'BEGIN INSERT INTO recipes_recipe_fts(recipes_recipe_fts, rowid, '
+        "name, text) VALUES ('delete', old.id, old.name, old.text); END"
+    ),
+    'recipes_recipe_fts_update': (
+        'CREATE TRIGGER recipes_recipe_fts_update '
+        'AFTER UPDATE OF name, text ON recipes_recipe '
+        'BEGIN INSERT INTO recipes_recipe_fts(recipes_recipe_fts, rowid, '
+        "name, text) VALUES ('delete', old.id, old.name, old.text); "
+        'INSERT INTO recipes_recipe_fts(rowid, name, text) '
+        'VALUES (new.id, new.name, new.text); END'
+    ),
+}
+
+
+def get_fts_query(value):
+    """Запрос FTS5 из слов строки: все слова, каждое как префикс.
+
+    Кавычки исключают синтаксис FTS5 из пользовательского ввода.
+    """
+    return ' '.join(f'"{word}"*' for word in re.findall(r'\w+', value))
+
+
+def restore_sqlite_triggers(connection):
+    """Создание недостающих триггеров FTS5 и перестроение таблицы поиска.
+
+    Ничего не делает, если таблицы поиска нет (миграция 0015 не
+    применена). Возвращает имена созданных триггеров.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT name FROM sqlite_master WHERE name LIKE 'recipes_recipe%'"
+        )
+        existing = {name for name, in cursor.fetchall()}
+
+        if 'recipes_recipe_fts' not in existing:
+            return []
+
+        missing = [name for name in SQLITE_TRIGGERS if name not in existing]
+
+        for name in missing:
+            cursor.execute(SQLITE_TRIGGERS[name])
+
+        if missing:
+            # Изменения рецептов без триггеров не попали в таблицу поиска.
+            cursor.execute(
+                'INSERT INTO recipes_recipe_fts(recipes_recipe_fts) '
+                "VALUES ('rebuild')"
+            )
+
+    return missing
+
+
+def search_recipes(queryset, value):
+    """Рецепты, подходящие под запрос value, с релевантностью
+    в аннотации search_rank (больше - релевантнее).
+    """
+    vendor = connections[queryset.db].vendor
+
+    if vendor == 'postgresql':
+        query = SearchQuery(
+            value, config=SEARCH_CONFIG, search_type='websearch'
+        )
+        return queryset.alias(
+            search_vector=RawSQL(
+                'recipes_recipe.search_vector', (),
+                output_field=SearchVectorField()
+            )
+        ).filter(search_vector=query).annotate(
+            search_rank=SearchRank(F('search_vector'), query)
+        )
+
+    if vendor == 'sqlite':
+        query = get_fts_query(value)
+
+        if not query:
+            return queryset.annotate(search_rank=NO_RANK).none()
+
+        return queryset.filter(id__in=RawSQL(
+            'SELECT rowid FROM recipes_recipe_fts '
+            'WHERE recipes_recipe_fts MATCH %s', (query,)
+        )).annotate(search_rank=RawSQL(
+            'SELECT -bm25(recipes_recipe_fts, %s, %s) '
+            'FROM recipes_recipe_fts WHERE recipes_recipe_fts MATCH %s '
+            'AND rowid = recipes_recipe.id',
+            (*FTS_WEIGHTS, query),
+            output_field=FloatField()
+        ))
+
+    return queryset.filter(
+        Q(name__icontains=value) | Q(text__icontains=value)
+    ).annotate(search_rank=NO_RANK)
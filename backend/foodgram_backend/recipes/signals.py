@@ -0,0 +1,268 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connections
+from django.db.models import F
+from django.db.models.signals import (
+    post_delete,
+    post_save,
+    pre_delete,
+    pre_save,
+)
+from django.dispatch import receiver
+from django.utils import timezone
+
+from api.cache import bump_table_version
+from users.models import Subscription
+
+from . import ingredient_index, search
+from .models import (
+    Favorite,
+    FeedEntry,
+    Ingredient,
+    Recipe,
+    RecipeIngredient,
+    ShoppingCart,
+    ShoppingCartTotal,
+)
+from .tasks import fan_out_author, fan_out_recipe, schedule_variants
+
+User = get_user_model()
+
+# Поля пользователя, которые входят в представление автора рецепта.
+AUTHOR_FIELDS = frozenset((
+    'email', 'username', 'first_name', 'last_name', 'avatar',
+    'avatar_variants',
+))
+
+
+def restore_search_triggers(using, **kwargs):
+    """Восстановление триггеров поиска, удаленных миграцией на SQLite.
+
+    Подключается к post_migrate в RecipesConfig.ready.
+    """
+    connection = connections[using]
+
+    if connection.vendor == 'sqlite' and search.restore_sqlite_triggers(
+        connection
+    ):
+        # Результаты поиска, закешированные до перестроения, устарели.
+        bump_table_version(Recipe._meta.db_table, using)
+
+
+@receiver((post_save, post_delete), sender=Ingredient)
+def invalidate_ingredient_index(**kwargs):
+    """Перестроение индекса автодополнения при изменении ингредиентов."""
+    ingredient_index.invalidate()
+
+
+@receiver(post_save, sender=ShoppingCart)
+def add_to_shopping_cart_totals(instance, created, **kwargs):
+    if created:
+        ShoppingCartTotal.objects.add_recipe(
+            instance.user_id, instance.recipe_id
+        )
+
+
+@receiver(pre_delete, sender=ShoppingCart)
+def remove_from_shopping_cart_totals(instance, **kwargs):
+    """Вычитание рецепта из итогов.
+
+    Используется pre_delete: при каскадном удалении рецепта его
+    ингредиенты к этому моменту еще не удалены.
+    """
+    ShoppingCartTotal.objects.remove_recipe(
+        instance.user_id, instance.recipe_id
+    )
+
+
+def is_deleted_directly(origin):
+    """Удаление строк RecipeIngredient начато с них самих (или это
+    сохранение), а не каскадом от рецепта, ингредиента или пользователя.
+    """
+    return origin is None or isinstance(origin, RecipeIngredient) or getattr(
+        origin, 'model', None
+    ) is RecipeIngredient
+
+
+@receiver(pre_save, sender=RecipeIngredient)
+def remember_recipe_ingredient(instance, raw, **kwargs):
+    """Запоминание сохраненного состояния строки для учета разницы
+    в итогах списков покупок.
+    """
+    instance._saved_state = None if raw or instance._state.adding else (
+        RecipeIngredient.objects.filter(pk=instance.pk).values_list(
+            'recipe_id', 'ingredient_id', 'amount'
+        ).first()
+    )
+
+
+@receiver((post_save, post_delete), sender=RecipeIngredient)
+def touch_recipe(instance, raw=False, origin=None, **kwargs):
+    """Сдвиг даты изменения рецепта (ETag и Last-Modified карточки)."""
+    if raw or not is_deleted_directly(origin):
+        return
+
+    recipe_ids = {instance.recipe_id}
+    saved = getattr(instance, '_saved_state', None)
+
+    if saved is not None:
+        recipe_ids.add(saved[0])
+
+    Recipe.objects.filter(pk__in=recipe_ids).update(updated_at=timezone.now())
+
+
+@receiver(post_save, sender=RecipeIngredient)
+def change_shopping_cart_totals(instance, raw, **kwargs):
+    """Учет изменения ингредиента рецепта у всех, у кого рецепт
+    в корзине.
+    """
+    if raw:
+        return
+
+    new_amounts = {instance.ingredient_id: instance.amount}
+    saved = getattr(instance, '_saved_state', None)
+
+    if saved is None:
+        ShoppingCartTotal.objects.change_recipe(
+            instance.recipe_id, {}, new_amounts
+        )
+        return
+
+    recipe_id, ingredient_id, amount = saved
+
+    if recipe_id == instance.recipe_id:
+        ShoppingCartTotal.objects.change_recipe(
+            recipe_id, {ingredient_id: amount}, new_amounts
+        )
+    else:
+        ShoppingCartTotal.objects.change_recipe(
+            recipe_id, {ingredient_id: amount}, {}
+        )
+        ShoppingCartTotal.objects.change_recipe(
+            instance.recipe_id, {}, new_amounts
+        )
+
+
+@receiver(post_delete, sender=RecipeIngredient)
+def remove_from_cart_totals(instance, origin, **kwargs):
+    """Вычитание удаленного ингредиента рецепта из итогов.
+
+    При каскадном удалении рецепта, ингредиента или пользователя итоги
+    учитывает удаление корзин и самих итогов.
+    """
+    if not is_deleted_directly(origin):
+        return
+
+    ShoppingCartTotal.objects.change_recipe(
+        instance.recipe_id, {instance.ingredient_id: instance.amount}, {}
+    )
+
+
+@receiver(post_save, sender=Favorite)
+def increment_favorites_count(instance, created, **kwargs):
+    if created:
+        Recipe.objects.filter(pk=instance.recipe_id).update(
+            favorites_count=F('favorites_count') + 1,
+            updated_at=timezone.now()
+        )
+
+
+@receiver(post_delete, sender=Favorite)
+def decrement_favorites_count(instance, **kwargs):
+    Recipe.objects.filter(
+        pk=instance.recipe_id, favorites_count__gt=0
+    ).update(
+        favorites_count=F('favorites_count') - 1,
+        updated_at=timezone.now()
+    )
+
+
+@receiver(post_save, sender=Recipe)
+def increment_recipes_count(instance, created, **kwargs):
+    if created:
+        User.objects.filter(pk=instance.author_id).update(
+            recipes_count=F('recipes_count') + 1
+        )
+
+
+@receiver(post_save, sender=Recipe)
+def add_to_feeds(instance, created, **kwargs):
+    """Рассылка рецепта по лентам подписчиков в очереди задач: у автора
+    их может быть до FEED_FANOUT_MAX_SUBSCRIBERS.
+    """
+    if created and FeedEntry.objects.is_fan_out_author(instance.author_id):
+        fan_out_recipe.enqueue(instance.id)
+
+
+@receiver(post_save, sender=Recipe)
+def process_recipe_image(instance, update_fields, **kwargs):
+    if update_fields is None or 'image' in update_fields:
+        schedule_variants(instance, 'image')
+
+
+@receiver(post_save, sender=User)
+def touch_author_recipes(instance, created, update_fields, **kwargs):
+    """Рецепты показывают данные автора, поэтому их дата изменения
+    сдвигается при изменении этих данных (но не last_login и счетчиков).
+    """
+    if created or (
+        update_fields is not None and not AUTHOR_FIELDS & set(update_fields)
+    ):
+        return
+
+    Recipe.objects.filter(author_id=instance.pk).update(
+        updated_at=timezone.now()
+    )
+
+
+@receiver(post_save, sender=User)
+def process_avatar(instance, update_fields, **kwargs):
+    if update_fields is None or 'avatar' in update_fields:
+        schedule_variants(instance, 'avatar')
+
+
+@receiver(post_delete, sender=Recipe)
+def decrement_recipes_count(instance, **kwargs):
+    User.objects.filter(
+        pk=instance.author_id, recipes_count__gt=0
+    ).update(recipes_count=F('recipes_count') - 1)
+
+
+@receiver(post_save, sender=Subscription)
+def subscribe_feed(instance, created, **kwargs):
+    """Учет подписчика и заполнение его ленты рецептами автора."""
+    if not created:
+        return
+
+    User.objects.filter(pk=instance.following_id).update(
+        subscribers_count=F('subscribers_count') + 1
+    )
+    FeedEntry.objects.backfill(instance.user_id, instance.following_id)
+    Subscription.objects.filter(pk=instance.pk).update(
+        feed_synced_at=timezone.now()
+    )
+
+
+@receiver(post_delete, sender=Subscription)
+def unsubscribe_feed(instance, **kwargs):
+    """Очистка ленты отписавшегося.
+
+    Если после отписки автор снова укладывается в порог рассылки,
+    его последние рецепты дописываются в ленты всех подписчиков:
+    пока он был популярным, они попадали туда только при чтении.
+    Рассылка идет в очереди задач; пока задача ждет, повторные
+    пересечения порога новых задач не создают.
+    """
+    User.objects.filter(
+        pk=instance.following_id, subscribers_count__gt=0
+    ).update(subscribers_count=F('subscribers_count') - 1)
+    FeedEntry.objects.prune(instance.user_id, instance.following_id)
+
+    if User.objects.filter(
+        pk=instance.following_id,
+        subscribers_count=settings.FEED_FANOUT_MAX_SUBSCRIBERS
+    ).exists():
+        fan_out_author.enqueue(
+            instance.following_id,
+            dedupe_key=f'feed:author:{instance.following_id}'
+        )
@@ -0,0 +1,66 @@
+from django.conf import settings
+from django.core.management import call_command
+
+from tasks.registry import task
+
+from .images import generate_variants, get_variants_field
+from .models import FeedEntry, Recipe
+
+
+@task(max_attempts=3)
+def process_image(model_label, pk, field_name):
+    """Создание уменьшенных копий изображения (recipes.images)."""
+    generate_variants(model_label, pk, field_name)
+
+
+@task(max_attempts=3)
+def fan_out_recipe(recipe_id):
+    """Запись нового рецепта в ленты подписчиков автора."""
+    recipe = Recipe.objects.filter(pk=recipe_id).first()
+
+    if recipe and FeedEntry.objects.is_fan_out_author(recipe.author_id):
+        FeedEntry.objects.fan_out((recipe,))
+
+
+@task(max_attempts=3)
+def fan_out_author(author_id):
+    """Запись последних рецептов автора в ленты подписчиков, когда
+    автор снова укладывается в порог рассылки.
+    """
+    if FeedEntry.objects.is_fan_out_author(author_id):
+        FeedEntry.objects.fan_out(
+            Recipe.objects.filter(author_id=author_id).order_by(
+                '-pub_date', '-id'
+            )[:settings.FEED_BACKFILL_SIZE]
+        )
+
+
+@task(max_attempts=1)
+def reconcile_counters():
+    """Исправление расхождений денормализованных счетчиков."""
+    call_command('reconcile_counters')
+
+
+@task(max_attempts=1)
+def collect_media_garbage():
+    """Удаление файлов изображений, на которые нет ссылок."""
+    call_command('collect_media_garbage')
+
+
+def schedule_variants(instance, field_name):
+    """Постановка в очередь обработки нового изображения.
+
+    Запрос не ждет обработки; пока копии не готовы, API отдает
+    для них null.
+    """
+    image = getattr(instance, field_name)
+    variants = getattr(instance, get_variants_field(field_name))
+
+    if not image or variants.get('source') == image.name:
+        return
+
+    label = instance._meta.label
+    process_image.enqueue(
+        label, instance.pk, field_name,
+        dedupe_key=f'image:{label}:{instance.pk}:{field_name}'
+    )
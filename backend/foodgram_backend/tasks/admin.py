@@ -0,0 +1,30 @@
+from django.contrib import admin
+from django.utils import timezone
+
+from .models import Task
+
+
+@admin.action(description='Поставить в очередь заново')
+def requeue(modeladmin, request, queryset):
+    queryset.filter(status=Task.Status.FAILED).update(
+        status=Task.Status.QUEUED,
+        attempts=0,
+        run_at=timezone.now(),
+    )
+
+
+class TaskAdmin(admin.ModelAdmin):
+    list_display = (
+        'id',
+        'name',
+        'status',
+        'attempts',
+        'run_at',
+        'created_at',
+    )
+    list_filter = ('status', 'name')
+    search_fields = ('name', 'dedupe_key')
+    actions = (requeue,)
+
+
+admin.site.register(Task, TaskAdmin)
@@ -0,0 +1,45 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from tasks.registry import REGISTRY, get_task
+
+
+class Command(BaseCommand):
+    help = (
+        'Постановка зарегистрированной задачи в очередь, например из cron: '
+        'enqueue_task recipes.tasks.reconcile_counters.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('name', nargs='?')
+        parser.add_argument(
+            'task_args', nargs='*', metavar='arg',
+            help='Аргументы задачи в формате JSON.'
+        )
+        parser.add_argument(
+            '--dedupe', action='store_true',
+            help='Не ставить задачу, если такая же уже ждет в очереди.'
+        )
+        parser.add_argument('--delay', type=float, default=0)
+
+    def handle(self, *args, **options):
+        if options['name'] is None:
+            self.stdout.write('\n'.join(sorted(REGISTRY)))
+            return
+
+        try:
+            registered = get_task(options['name'])
+            task_args = [json.loads(value) for value in options['task_args']]
+        except (LookupError, ValueError) as error:
+            raise CommandError(error)
+
+        task = registered.enqueue(
+            *task_args,
+            dedupe_key=(
+                json.dumps([registered.name, task_args])
+                if options['dedupe'] else None
+            ),
+            delay=options['delay'],
+        )
+        self.stdout.write(f'Задача {task.pk if task else "выполнена"}.')
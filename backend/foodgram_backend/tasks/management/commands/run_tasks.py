@@ -0,0 +1,97 @@
+import multiprocessing
+import signal
+import time
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    wait,
+)
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connections
+
+from tasks.models import Task
+from tasks.worker import execute, setup_process
+
+
+class Command(BaseCommand):
+    help = (
+        'Воркер очереди фоновых задач: забирает готовые задачи из базы '
+        'и выполняет их в пуле потоков или процессов.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=settings.TASKS_WORKERS,
+            help='Число одновременно выполняемых задач.'
+        )
+        parser.add_argument(
+            '--processes', action='store_true',
+            help=(
+                'Выполнять задачи в пуле процессов (для задач, нагружающих '
+                'процессор), а не потоков.'
+            )
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Выполнить готовые задачи и завершиться.'
+        )
+        parser.add_argument(
+            '--poll-interval', type=float,
+            default=settings.TASKS_POLL_INTERVAL,
+            help='Пауза между опросами пустой очереди в секундах.'
+        )
+
+    def handle(self, *args, **options):
+        self.stopping = False
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+        workers = options['workers']
+        # Соединения не должны переходить в дочерние процессы.
+        connections.close_all()
+        executor = (
+            ProcessPoolExecutor(
+                workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=setup_process,
+            ) if options['processes'] else ThreadPoolExecutor(
+                workers, thread_name_prefix='tasks'
+            )
+        )
+        running = set()
+        completed = 0
+
+        with executor:
+            while not self.stopping:
+                running = {future for future in running if not future.done()}
+                claimed = []
+
+                if len(running) < workers:
+                    close_old_connections()
+                    claimed = Task.objects.claim(workers - len(running))
+
+                for pk, attempt in claimed:
+                    running.add(executor.submit(execute, pk, attempt))
+                completed += len(claimed)
+
+                if options['once'] and not claimed and not running:
+                    break
+
+                if not claimed:
+                    if running:
+                        wait(
+                            running,
+                            timeout=options['poll_interval'],
+                            return_when=FIRST_COMPLETED
+                        )
+                    else:
+                        time.sleep(options['poll_interval'])
+
+        self.stdout.write(f'Обработано задач: {completed}.')
+
+    def stop(self, signum, frame):
+        """Завершение после выполнения уже начатых задач."""
+        self.stopping = True
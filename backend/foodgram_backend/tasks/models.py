@@ -0,0 +1,179 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, connections, models, transaction
+from django.utils import timezone
+
+
+class TaskManager(models.Manager):
+
+    def enqueue(
+        self, name, args=(), kwargs=None, *, dedupe_key=None, delay=0,
+        max_attempts=None
+    ):
+        """Постановка задачи в очередь.
+
+        Строка задачи пишется в текущей транзакции, поэтому воркер видит
+        задачу только после ее фиксации, а при откате задача исчезает
+        вместе с данными. Если в очереди уже ждет задача с тем же
+        dedupe_key, новая не создается и возвращается существующая.
+        """
+        task = self.model(
+            name=name,
+            args=list(args),
+            kwargs=kwargs or {},
+            dedupe_key=dedupe_key,
+            run_at=timezone.now() + timedelta(seconds=delay),
+            max_attempts=max_attempts or settings.TASKS_MAX_ATTEMPTS,
+        )
+
+        if dedupe_key is None:
+            task.save(using=self.db)
+            return task
+
+        try:
+            with transaction.atomic(using=self.db):
+                task.save(using=self.db)
+        except IntegrityError:
+            return self.filter(
+                dedupe_key=dedupe_key, status=Task.Status.QUEUED
+            ).first()
+
+        return task
+
+    def claim(self, limit):
+        """Выдача воркеру до limit задач, готовых к выполнению.
+
+        Готовы ожидающие задачи, срок которых наступил, и выполняемые,
+        у которых истек locked_until (воркер упал или завис). Задача
+        с истекшим locked_until, исчерпавшая попытки, получает статус
+        failed: иначе задача, каждый раз роняющая воркер, выдавалась бы
+        бесконечно. Задача захватывается условным UPDATE по числу
+        попыток, поэтому два воркера не получат одну задачу.
+        На PostgreSQL кандидаты выбираются с SKIP LOCKED, и воркеры
+        не ждут друг друга. Возвращает пары (id, номер попытки).
+        """
+        now = timezone.now()
+        expired = models.Q(status=Task.Status.RUNNING, locked_until__lte=now)
+        exhausted = models.Q(attempts__gte=models.F('max_attempts'))
+
+        self.filter(expired & exhausted).update(
+            status=Task.Status.FAILED,
+            locked_until=None,
+            last_error='Задача не завершилась за TASKS_VISIBILITY_TIMEOUT.',
+        )
+        candidates = self.filter(
+            models.Q(status=Task.Status.QUEUED, run_at__lte=now)
+            | expired & ~exhausted
+        ).order_by('run_at', 'id').values_list('id', 'attempts')
+
+        if not connections[self.db].features.has_select_for_update_skip_locked:
+            return self._lock(candidates[:limit], now)
+
+        with transaction.atomic(using=self.db):
+            return self._lock(
+                candidates.select_for_update(skip_locked=True)[:limit], now
+            )
+
+    def _lock(self, candidates, now):
+        locked_until = now + timedelta(
+            seconds=settings.TASKS_VISIBILITY_TIMEOUT
+        )
+        claimed = []
+
+        for pk, attempts in list(candidates):
+            if self.filter(pk=pk, attempts=attempts).update(
+                status=Task.Status.RUNNING,
+                attempts=attempts + 1,
+                locked_until=locked_until,
+            ):
+                claimed.append((pk, attempts + 1))
+
+        return claimed
+
+
+class Task(models.Model):
+    """Задача фоновой очереди.
+
+    Успешно выполненные задачи удаляются, задачи, исчерпавшие попытки,
+    остаются со статусом failed и текстом последней ошибки.
+    """
+
+    class Status(models.TextChoices):
+        QUEUED = 'queued', 'В очереди'
+        RUNNING = 'running', 'Выполняется'
+        FAILED = 'failed', 'Ошибка'
+
+    name = models.CharField(max_length=200, verbose_name='Задача')
+    args = models.JSONField(default=list, blank=True)
+    kwargs = models.JSONField(default=dict, blank=True)
+    status = models.CharField(
+        max_length=16,
+        choices=Status.choices,
+        default=Status.QUEUED,
+        verbose_name='Статус'
+    )
+    dedupe_key = models.CharField(
+        max_length=255,
+        null=True,
+        blank=True,
+        verbose_name='Ключ дедупликации'
+    )
+    attempts = models.PositiveSmallIntegerField(
+        default=0,
+        verbose_name='Попыток'
+    )
+    max_attempts = models.PositiveSmallIntegerField(
+        verbose_name='Наибольшее число попыток'
+    )
+    run_at = models.DateTimeField(verbose_name='Выполнить после')
+    locked_until = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name='Занята воркером до'
+    )
+    last_error = models.TextField(blank=True, verbose_name='Ошибка')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    objects = TaskManager()
+
+    class Meta:
+        verbose_name = 'Задача'
+        verbose_name_plural = 'Задачи'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['dedupe_key'],
+                condition=models.Q(status='queued'),
+                name='unique_queued_task'
+            )
+        ]
+        indexes = [
+            models.Index(fields=['status', 'run_at'], name='task_due_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.name} ({self.get_status_display()})'
+
+    def finish(self):
+        Task.objects.filter(pk=self.pk, attempts=self.attempts).delete()
+
+    def fail(self, error):
+        """Повтор с экспоненциальной задержкой или статус failed."""
+        changes = {'last_error': error, 'locked_until': None}
+
+        if self.attempts >= self.max_attempts:
+            changes['status'] = Task.Status.FAILED
+        else:
+            changes['status'] = Task.Status.QUEUED
+            changes['run_at'] = timezone.now() + timedelta(
+                seconds=settings.TASKS_RETRY_DELAY * 2 ** (self.attempts - 1)
+            )
+
+        tasks = Task.objects.filter(pk=self.pk, attempts=self.attempts)
+
+        try:
+            with transaction.atomic():
+                tasks.update(**changes)
+        except IntegrityError:
+            # В очереди уже ждет такая же задача, она заменит повтор.
+            tasks.delete()
@@ -0,0 +1,63 @@
+from functools import update_wrapper
+
+from django.conf import settings
+from django.db import transaction
+
+REGISTRY = {}
+
+
+class RegisteredTask:
+    """Функция, которую можно вызвать сразу или поставить в очередь."""
+
+    def __init__(self, func, name, max_attempts):
+        self.func = func
+        self.name = name
+        self.max_attempts = max_attempts
+        update_wrapper(self, func)
+
+    def __call__(self, *args, **kwargs):
+        return self.func(*args, **kwargs)
+
+    def enqueue(self, *args, dedupe_key=None, delay=0, **kwargs):
+        """Постановка в очередь; аргументы должны сериализоваться в JSON.
+
+        При TASKS_EAGER задача выполняется в этом же процессе после
+        фиксации текущей транзакции.
+        """
+        if settings.TASKS_EAGER:
+            transaction.on_commit(lambda: self.func(*args, **kwargs))
+            return None
+
+        from .models import Task
+
+        return Task.objects.enqueue(
+            self.name, args, kwargs,
+            dedupe_key=dedupe_key,
+            delay=delay,
+            max_attempts=self.max_attempts,
+        )
+
+
+def task(name=None, max_attempts=None):
+    """Регистрация функции как фоновой задачи.
+
+    По умолчанию имя задачи - путь к функции, например
+    recipes.tasks.process_image.
+    """
+    def decorator(func):
+        registered = RegisteredTask(
+            func,
+            name or f'{func.__module__}.{func.__qualname__}',
+            max_attempts,
+        )
+        REGISTRY[registered.name] = registered
+        return registered
+
+    return decorator
+
+
+def get_task(name):
+    try:
+        return REGISTRY[name]
+    except KeyError:
+        raise LookupError(f'Неизвестная задача: {name}')
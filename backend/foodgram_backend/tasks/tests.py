@@ -0,0 +1,84 @@
+from datetime import timedelta
+
+from django.test import TestCase
+from django.utils import timezone
+
+from .models import Task
+
+NAME = 'recipes.tasks.process_image'
+
+
+class TaskQueueTests(TestCase):
+    """Дедупликация, повторы с задержкой и повторная выдача задач
+    упавшего воркера.
+    """
+
+    def get_task(self, pk):
+        return Task.objects.get(pk=pk)
+
+    def expire_lock(self, pk):
+        Task.objects.filter(pk=pk).update(
+            locked_until=timezone.now() - timedelta(seconds=1)
+        )
+
+    def test_dedupe(self):
+        first = Task.objects.enqueue(NAME, (1,), dedupe_key='image:1')
+        second = Task.objects.enqueue(NAME, (2,), dedupe_key='image:1')
+        self.assertEqual(second.pk, first.pk)
+        self.assertEqual(Task.objects.count(), 1)
+
+        # Выполняемая задача не мешает поставить в очередь новую.
+        self.assertEqual(Task.objects.claim(10), [(first.pk, 1)])
+        third = Task.objects.enqueue(NAME, (3,), dedupe_key='image:1')
+        self.assertNotEqual(third.pk, first.pk)
+        self.assertEqual(Task.objects.count(), 2)
+
+    def test_retry(self):
+        pk = Task.objects.enqueue(NAME, max_attempts=2).pk
+        self.assertEqual(Task.objects.claim(10), [(pk, 1)])
+
+        self.get_task(pk).fail('Ошибка 1')
+        task = self.get_task(pk)
+        self.assertEqual(task.status, Task.Status.QUEUED)
+        self.assertGreater(task.run_at, timezone.now())
+        self.assertEqual(Task.objects.claim(10), [])
+
+        Task.objects.filter(pk=pk).update(run_at=timezone.now())
+        self.assertEqual(Task.objects.claim(10), [(pk, 2)])
+
+        self.get_task(pk).fail('Ошибка 2')
+        task = self.get_task(pk)
+        self.assertEqual(task.status, Task.Status.FAILED)
+        self.assertEqual(task.last_error, 'Ошибка 2')
+        self.assertEqual(Task.objects.claim(10), [])
+
+    def test_finish(self):
+        pk = Task.objects.enqueue(NAME).pk
+        Task.objects.claim(10)
+        self.get_task(pk).finish()
+        self.assertFalse(Task.objects.filter(pk=pk).exists())
+
+    def test_reclaim_expired(self):
+        pk = Task.objects.enqueue(NAME, max_attempts=2).pk
+        self.assertEqual(Task.objects.claim(10), [(pk, 1)])
+        self.assertEqual(Task.objects.claim(10), [])
+
+        self.expire_lock(pk)
+        self.assertEqual(Task.objects.claim(10), [(pk, 2)])
+
+        # Воркер старой попытки не может завершить задачу.
+        stale = self.get_task(pk)
+        stale.attempts = 1
+        stale.finish()
+        self.assertTrue(Task.objects.filter(pk=pk).exists())
+
+    def test_expired_without_attempts_fails(self):
+        pk = Task.objects.enqueue(NAME, max_attempts=1).pk
+        self.assertEqual(Task.objects.claim(10), [(pk, 1)])
+
+        self.expire_lock(pk)
+        self.assertEqual(Task.objects.claim(10), [])
+        task = self.get_task(pk)
+        self.assertEqual(task.status, Task.Status.FAILED)
+        self.assertIsNone(task.locked_until)
+        self.assertTrue(task.last_error)
@@ -0,0 +1,40 @@
+"""Выполнение задач очереди в потоках или процессах воркера run_tasks.
+
+Модели импортируются внутри функций: процессы пула запускаются
+с чистым интерпретатором и сначала вызывают setup_process.
+"""
+import traceback
+
+
+def setup_process():
+    import django
+
+    django.setup()
+
+
+def execute(pk, attempt):
+    """Выполнение задачи, захваченной воркером (попытка attempt)."""
+    from django.db import close_old_connections
+
+    from .models import Task
+    from .registry import get_task
+
+    close_old_connections()
+
+    try:
+        task = Task.objects.filter(
+            pk=pk, attempts=attempt, status=Task.Status.RUNNING
+        ).first()
+
+        # Задачу уже выдали повторно по истечении locked_until.
+        if task is None:
+            return
+
+        try:
+            get_task(task.name)(*task.args, **task.kwargs)
+        except Exception:
+            task.fail(traceback.format_exc())
+        else:
+            task.finish()
+    finally:
+        close_old_connections()
@@ -4,9 +4,14 @@ from django.contrib.auth.admin import UserAdmin
 from .models import CustomUser, Subscription
 
 UserAdmin.fieldsets += (
-    ('Extra Fields', {'fields': ('avatar',)}),
+    ('Extra Fields', {'fields': ('avatar', 'recipes_count')}),
 )
 
 
-admin.site.register(CustomUser, UserAdmin)
+class CustomUserAdmin(UserAdmin):
+    list_display = UserAdmin.list_display + ('recipes_count',)
+    readonly_fields = ('recipes_count',)
+
+
+admin.site.register(CustomUser, CustomUserAdmin)
 admin.site.register(Subscription)
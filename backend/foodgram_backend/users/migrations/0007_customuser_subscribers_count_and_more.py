@@ -0,0 +1,41 @@
+# Generated by Django 4.2.21 on 2026-10-17 06:02
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def fill_subscribers_count(apps, schema_editor):
+    User = apps.get_model('users', 'CustomUser')
+    Subscription = apps.get_model('users', 'Subscription')
+
+    User.objects.update(subscribers_count=Coalesce(
+        models.Subquery(
+            Subscription.objects.filter(
+                following=models.OuterRef('pk')
+            ).order_by().values('following').annotate(
+                total=models.Count('pk')
+            ).values('total')
+        ),
+        0
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0006_customuser_recipes_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='subscribers_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Число подписчиков'),
+        ),
+        migrations.AddField(
+            model_name='subscription',
+            name='feed_synced_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Рецепты автора добавлены в ленту до'),
+        ),
+        migrations.RunPython(fill_subscribers_count, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.21 on 2026-10-17 11:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0008_customuser_avatar_variants'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='customuser',
+            name='avatar',
+            field=models.ImageField(blank=True, db_index=True, upload_to='users/images'),
+        ),
+    ]
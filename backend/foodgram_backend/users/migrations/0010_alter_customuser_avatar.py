@@ -0,0 +1,19 @@
+# Generated by Django 4.2.21 on 2026-10-17 13:05
+
+import foodgram_backend.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0009_alter_customuser_avatar'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='customuser',
+            name='avatar',
+            field=models.ImageField(blank=True, db_index=True, storage=foodgram_backend.storage.ContentAddressedStorage(), upload_to='users/images'),
+        ),
+    ]
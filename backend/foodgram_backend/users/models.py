@@ -2,6 +2,8 @@ from django.contrib.auth.models import AbstractUser
 from django.contrib.auth.validators import UnicodeUsernameValidator
 from django.db import models
 
+from foodgram_backend.storage import image_storage
+
 
 class CustomUser(AbstractUser):
     """Собственная модель пользователя с его фотографией."""
@@ -15,9 +17,27 @@ class CustomUser(AbstractUser):
     )
     avatar = models.ImageField(
         upload_to='users/images',
-        blank=True
+        storage=image_storage,
+        blank=True,
+        db_index=True
+    )
+    avatar_variants = models.JSONField(
+        default=dict,
+        blank=True,
+        editable=False,
+        verbose_name='Уменьшенные копии аватара'
     )
     email = models.EmailField(unique=True)
+    recipes_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Число рецептов'
+    )
+    subscribers_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Число подписчиков'
+    )
 
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ('first_name', 'last_name', 'username', )
@@ -44,6 +64,12 @@ class Subscription(models.Model):
         on_delete=models.CASCADE,
         related_name='following'
     )
+    feed_synced_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        editable=False,
+        verbose_name='Рецепты автора добавлены в ленту до'
+    )
 
     class Meta:
         verbose_name = 'Подписка'